@@ -0,0 +1,249 @@
+"""
+Reading acquisitions from the analyzer firmware over a serial port.
+
+Nothing here depends on Qt, and the port is passed in, so any object with the
+pyserial Serial interface, such as a loopback pty, can stand in for the
+hardware.
+"""
+import time
+
+import timing
+from models import Acquisition, unpack_samples
+
+
+def find_port(description='usb'):
+    """
+    Returns the device path of the first serial port with description in its
+    description, or None if there is no such port.
+    """
+    from serial.tools import list_ports
+    for item in list_ports.comports():
+        if description in item[2]:
+            return item[0]
+    return None
+
+
+def open_port(com_name=None, baud=115200, timeout=0.1):
+    """
+    Opens the serial port com_name, or the first USB serial port if com_name
+    is None.
+
+    The timeout bounds how long a single read blocks, so readers can check
+    for cancellation between reads.
+    """
+    import serial
+    if com_name is None:
+        com_name = find_port()
+        if com_name is None:
+            raise IOError('Could not find a USB serial port.')
+    return serial.Serial(com_name, baud, timeout=timeout)
+
+
+class SerialReader:
+    """
+    Reads a single acquisition in chunks into a preallocated buffer.
+
+    Each chunk is unpacked to samples as it arrives, so a partial acquisition
+    is available before the transfer finishes.
+
+    Parameters
+    ----------
+    port : serial.Serial
+        An open port. Reads should time out, see open_port.
+    command : AnalyzerCommand
+        The command sent to the firmware to start the acquisition.
+    timeout : float
+        Seconds without any data before the acquisition is abandoned.
+    chunk_size : int
+        The minimum number of bytes requested per read.
+    channel_count : int
+        The number of channels in the acquisition.
+    wait_for_trigger : bool
+        If True the first chunk is waited for until stop is called, as a
+        hardware trigger may not fire for a long time, and timeout only
+        applies once the transfer has started.
+
+    Examples
+    --------
+    A stand in port that returns at most chunk bytes per read:
+
+    >>> from models import AnalyzerCommand
+    >>> class FakePort:
+    ...     def __init__(self, data, chunk):
+    ...         self.data, self.chunk, self.written = data, chunk, b''
+    ...     def flushInput(self): pass
+    ...     def flushOutput(self): pass
+    ...     def write(self, data): self.written += data
+    ...     def inWaiting(self): return min(len(self.data), self.chunk)
+    ...     def readinto(self, view):
+    ...         n = min(len(view), self.chunk, len(self.data))
+    ...         view[:n], self.data = self.data[:n], self.data[n:]
+    ...         return n
+    >>> data = bytes(range(250)) * 4
+    >>> command = AnalyzerCommand(sample_count=2000)
+    >>> port = FakePort(data, 300)
+    >>> reader = SerialReader(port, command, chunk_size=256)
+    >>> progress = []
+    >>> acquisition = reader.read(lambda received, total: progress.append(
+    ...     (received, total)))
+    >>> progress
+    [(300, 1000), (600, 1000), (900, 1000), (1000, 1000)]
+    >>> port.written == command.command_bytes
+    True
+    >>> acquisition.samples == unpack_samples(data)
+    True
+
+    If the transfer stalls the samples received so far are kept:
+
+    >>> reader = SerialReader(FakePort(data[:100], 300), command,
+    ...                       timeout=0.01)
+    >>> reader.read()
+    Traceback (most recent call last):
+        ...
+    TimeoutError: No data received for 0.01 s.
+    >>> reader.acquisition().acquisition_length
+    200
+    """
+    def __init__(self, port, command, timeout=5.0, chunk_size=4096,
+                 channel_count=4, wait_for_trigger=False):
+        self.port = port
+        self.command = command
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.channel_count = channel_count
+        self.wait_for_trigger = wait_for_trigger
+        self.buffer = bytearray(command.sample_count // 2)
+        self.samples = bytearray(2 * len(self.buffer))
+        self.received = 0
+        self._stopped = False
+
+    @property
+    def total(self):
+        """
+        The number of bytes in a complete acquisition.
+        """
+        return len(self.buffer)
+
+    def start(self):
+        """
+        Flushes the port and sends the acquisition command.
+        """
+        self.received = 0
+        self.port.flushInput()
+        self.port.flushOutput()
+        self.port.write(self.command.command_bytes)
+
+    def read_chunk(self):
+        """
+        Reads the next chunk into the buffer, blocking for at most the port
+        timeout, and unpacks it.
+
+        Returns
+        -------
+        int
+            The number of bytes received, 0 if the read timed out.
+        """
+        remaining = self.total - self.received
+        size = min(remaining, max(self.chunk_size, self.port.inWaiting()))
+        start = self.received
+        with memoryview(self.buffer) as view:
+            n = self.port.readinto(view[start:start + size]) or 0
+        if n:
+            with timing.span('unpack', size=n):
+                self.samples[2 * start:2 * (start + n)] = unpack_samples(
+                    self.buffer[start:start + n])
+            self.received += n
+        return n
+
+    def read(self, chunk_callback=None):
+        """
+        Sends the command and reads the whole acquisition.
+
+        Parameters
+        ----------
+        chunk_callback : callable
+            Called as chunk_callback(received, total) after every chunk.
+
+        Returns
+        -------
+        Acquisition
+            The acquisition, or None if stop was called first.
+
+        Raises
+        ------
+        TimeoutError
+            If no data arrives for timeout seconds, see wait_for_trigger.
+        """
+        self.start()
+        last_data = time.monotonic()
+        while self.received < self.total:
+            if self._stopped:
+                return None
+            if self.read_chunk():
+                last_data = time.monotonic()
+                if chunk_callback is not None:
+                    chunk_callback(self.received, self.total)
+            elif self.wait_for_trigger and not self.received:
+                continue
+            elif time.monotonic() - last_data > self.timeout:
+                raise TimeoutError('No data received for %g s.'
+                                   % self.timeout)
+        return self.acquisition()
+
+    def acquisition(self):
+        """
+        Returns an Acquisition of the samples received so far.
+        """
+        return Acquisition.from_samples(
+            self.samples[:2 * self.received], self.channel_count,
+            self.command.sample_rate,
+            trigger_type=self.command.trigger_type,
+            trigger_channel=self.command.trigger_channel)
+
+    def stop(self):
+        """
+        Cancels read, it returns None within one port timeout.
+        """
+        self._stopped = True
+
+
+class ContinuousReader:
+    """
+    Repeatedly acquires on a port that is kept open.
+
+    The command is sent again after each capture. A single SerialReader and
+    its preallocated buffers are reused, each Acquisition holds a copy of
+    its samples, so capture N + 1 is received while capture N is decoded and
+    displayed. The reader waits for each trigger until stop is called.
+
+    Parameters are as for SerialReader.
+    """
+    def __init__(self, port, command, timeout=5.0, chunk_size=4096,
+                 channel_count=4):
+        self.reader = SerialReader(port, command, timeout, chunk_size,
+                                   channel_count, wait_for_trigger=True)
+        self.count = 0
+        self._stopped = False
+
+    def captures(self, chunk_callback=None):
+        """
+        Yields an Acquisition for every capture until stop is called.
+
+        Raises
+        ------
+        TimeoutError
+            If a transfer stalls for timeout seconds after it has started.
+        """
+        while not self._stopped:
+            acquisition = self.reader.read(chunk_callback)
+            if acquisition is None:
+                return
+            self.count += 1
+            yield acquisition
+
+    def stop(self):
+        """
+        Stops after the current capture is abandoned, see SerialReader.stop.
+        """
+        self._stopped = True
+        self.reader.stop()
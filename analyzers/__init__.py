@@ -0,0 +1,192 @@
+"""
+An Analyzer class should take an Acquisition object and return a list of labels
+and their resepective locations and widths: [(10, 80, 'A'), (8, 80, 'B'), ...].
+where 10 is the left edge, 80 is the width of the label, and 'A' is the text.
+
+Analyzers are registered by name along with their channel names, options and
+the import path of their factory. The module holding an analyzer is only
+imported when the analyzer is first created, so listing analyzers is cheap
+and does not require Qt.
+"""
+
+import importlib
+from collections import OrderedDict
+
+
+class Option:
+    """
+    Describes a single analyzer option, passed to the factory as a keyword
+    argument.
+
+    Parameters
+    ----------
+    name : str
+        The keyword argument name.
+    label : str
+        The text displayed next to the option.
+    choices : list of tuple
+        (text, value) pairs the option can take.
+    default : int
+        The index of the default choice.
+    editable : bool
+        If True a value not in choices may be entered, it is parsed as an
+        int.
+    """
+    def __init__(self, name, label, choices, default=0, editable=False):
+        self.name = name
+        self.label = label
+        self.choices = choices
+        self.default = default
+        self.editable = editable
+
+    def value(self, text):
+        """
+        Returns the option value for the displayed or entered text. The text
+        of the value itself, such as 'True' or 'None', is also accepted and
+        case is ignored.
+        """
+        for choice_text, value in self.choices:
+            if text.lower() in (choice_text.lower(), str(value).lower()):
+                return value
+        if self.editable:
+            return int(text)
+        raise ValueError('Invalid value %r for %s.' % (text, self.label))
+
+
+class AnalyzerInfo:
+    """
+    Describes a registered analyzer without importing it.
+
+    Parameters
+    ----------
+    name : str
+        The display name of the analyzer.
+    channel_names : list of str
+        The name of each channel when the analyzer is selected.
+    factory : str
+        The 'module:attribute' path of the callable creating the analyzer,
+        it is called with the acquisition and the options.
+    options : list of Option
+        The options accepted by the factory.
+    """
+    def __init__(self, name, channel_names, factory, options=()):
+        self.name = name
+        self.channel_names = list(channel_names)
+        self.factory = factory
+        self.options = list(options)
+        self._factory = None
+
+    def default_options(self):
+        return dict((o.name, o.choices[o.default][1]) for o in self.options)
+
+    def load(self):
+        """
+        Imports and returns the factory.
+        """
+        if self._factory is None:
+            module_name, attribute = self.factory.split(':')
+            module = importlib.import_module(module_name)
+            self._factory = getattr(module, attribute)
+        return self._factory
+
+    def create(self, acquisition, **options):
+        """
+        Returns a new analyzer for acquisition, options not given take their
+        default value.
+        """
+        kwargs = self.default_options()
+        kwargs.update(options)
+        return self.load()(acquisition, **kwargs)
+
+
+_registry = OrderedDict()
+
+
+def register(name, channel_names, factory, options=()):
+    """
+    Registers an analyzer, see AnalyzerInfo for the parameters.
+    """
+    _registry[name.lower()] = AnalyzerInfo(name, channel_names, factory,
+                                           options)
+
+
+def names():
+    """
+    Returns the names of the registered analyzers, in registration order.
+    """
+    return [info.name for info in _registry.values()]
+
+
+def info(name):
+    """
+    Returns the AnalyzerInfo registered as name.
+    """
+    try:
+        return _registry[name.lower()]
+    except KeyError:
+        raise ValueError('Unknown analyzer %s.' % name)
+
+
+def create(name, acquisition, **options):
+    """
+    Returns a new analyzer registered as name for acquisition.
+    """
+    return info(name).create(acquisition, **options)
+
+
+def labels(protocol):
+    if protocol.lower() in _registry:
+        return info(protocol).channel_names
+    else:
+        return ['Ch 0', 'Ch 1', 'Ch 2', 'Ch 3']
+
+
+def format_byte(value, format_type='ascii'):
+    """
+    Returns a string for displaying a byte value in the requested format.
+
+    Parameters
+    ----------
+    value : int or str
+        The value to format, should be 0 - 255. Labels for protocol events
+        are str and are returned unchanged.
+
+    format_type : str
+        The display format, one of 'ascii', 'hex', 'decimal'.
+    """
+    if isinstance(value, str):
+        return value
+    format_type = format_type.lower()
+    if format_type == 'ascii':
+        return chr(value)
+    elif format_type == 'hex':
+        return hex(value)
+    elif format_type == 'decimal':
+        return str(value)
+    else:
+        raise ValueError("format_type must be 'ascii', 'hex', or 'decimal'")
+
+
+register('I2C', ['SCL', 'SDA', 'Ch 2', 'Ch 3'],
+         'analyzers.i2c:I2CAnalyzer')
+
+register('SPI', ['CLK', 'MOSI', 'MISO', 'CS'],
+         'analyzers.spi:SPIAnalyzer',
+         [Option('cpol', 'Clock Polarity', [('0', 0), ('1', 1)]),
+          Option('cpha', 'Clock Phase', [('0', 0), ('1', 1)]),
+          Option('msb_first', 'Bit Order',
+                 [('MSB First', True), ('LSB First', False)]),
+          Option('word_size', 'Word Size',
+                 [(str(n), n) for n in range(4, 17)], default=4),
+          Option('cs_polarity', 'Chip Select',
+                 [('Active Low', 0), ('Active High', 1), ('Unused', None)])])
+
+register('USART', ['RX', 'TX', 'Ch 2', 'Ch 3'],
+         'analyzers.usart:USARTAnalyzer',
+         [Option('baud', 'Baud',
+                 [('Auto', None)] + [(str(b), b) for b in
+                                     [300, 1200, 2400, 4800, 9600, 19200,
+                                      38400, 57600, 115200]],
+                 editable=True),
+          Option('bit_count', 'Data Bits',
+                 [(str(n), n) for n in range(5, 9)], default=3)])
@@ -0,0 +1,160 @@
+"""
+Batch analysis of capture files on a process pool.
+
+Only file paths are sent to the worker processes and only a small summary of
+each file comes back. Every worker loads its captures itself, .lgc files are
+memory mapped and their packed data copied out of the mapping once, so no
+samples or labels are pickled between processes and throughput grows with
+the number of cores.
+"""
+
+import concurrent.futures
+import os
+import time
+from collections import Counter
+
+import analyzers
+from models import Acquisition
+
+CAPTURE_EXTENSIONS = ('.lgc', '.csv')
+
+
+def capture_files(paths):
+    """
+    Returns the capture files in paths, directories are searched
+    recursively for files ending in one of CAPTURE_EXTENSIONS.
+    """
+    files = []
+    for path in paths:
+        if not os.path.isdir(path):
+            files.append(path)
+            continue
+        for root, dirs, names in os.walk(path):
+            dirs.sort()
+            files.extend(os.path.join(root, name) for name in sorted(names)
+                         if name.lower().endswith(CAPTURE_EXTENSIONS))
+    return files
+
+
+def analyze_file(path, name, options):
+    """
+    Loads the capture at path and summarizes its analysis.
+
+    Parameters
+    ----------
+    path : str
+        The capture file.
+    name : str
+        The registered analyzer name.
+    options : dict
+        The analyzer options.
+
+    Returns
+    -------
+    dict
+        The summary, with one entry per decoded channel in 'channels'. If the
+        file could not be loaded or analyzed 'error' holds the reason, so one
+        bad file does not abort the batch.
+    """
+    summary = {'source': path, 'error': None}
+    start = time.perf_counter()
+    try:
+        acquisition = Acquisition(path)
+        analyzer = analyzers.create(name, acquisition, **options)
+        labels = analyzer.labels()
+    except Exception as e:
+        summary['error'] = '%s: %s' % (type(e).__name__, e)
+        return summary
+    summary['samples'] = acquisition.acquisition_length
+    summary['sample_rate'] = acquisition.sample_rate
+    summary['baud'] = getattr(analyzer, 'baud', None)
+    summary['baud_confidence'] = getattr(analyzer, 'baud_confidence', None)
+    channels = {}
+    for n, (channel, waveform_labels) in enumerate(
+            zip(analyzers.labels(name), labels)):
+        if not len(waveform_labels):
+            continue
+        errors = None
+        if hasattr(analyzer, 'frame_errors'):
+            errors = len(analyzer.frame_errors(n, waveform_labels))
+        channels[channel] = {
+            'frames': len(waveform_labels),
+            'bytes': sum(1 for x, width, value in waveform_labels
+                         if not isinstance(value, str)),
+            'errors': errors}
+    summary['channels'] = channels
+    summary['seconds'] = time.perf_counter() - start
+    return summary
+
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def run_batch(paths, name, options=None, jobs=None, progress=None):
+    """
+    Analyzes every capture file in paths on a process pool.
+
+    Parameters
+    ----------
+    paths : list of str
+        Capture files and directories, see capture_files.
+    name : str
+        The registered analyzer name.
+    options : dict
+        The analyzer options.
+    jobs : int
+        The number of worker processes, by default one per core.
+    progress : callable
+        Called as progress(done, total) each time a file is complete.
+
+    Returns
+    -------
+    dict
+        The report, the summary of each file in 'files', in the order given,
+        and their aggregate in 'totals'.
+    """
+    files = capture_files(paths)
+    options = options or {}
+    start = time.perf_counter()
+    with concurrent.futures.ProcessPoolExecutor(jobs) as executor:
+        # The largest files are submitted first so a long file does not run
+        # alone at the end of the batch.
+        futures = dict(
+            (executor.submit(analyze_file, path, name, options), path)
+            for path in sorted(files, key=_file_size, reverse=True))
+        results = {}
+        for done, future in enumerate(
+                concurrent.futures.as_completed(futures), 1):
+            results[futures[future]] = future.result()
+            if progress is not None:
+                progress(done, len(files))
+    summaries = [results[path] for path in files]
+    return {'analyzer': analyzers.info(name).name,
+            'options': options,
+            'files': summaries,
+            'totals': _totals(summaries, time.perf_counter() - start)}
+
+
+def _totals(summaries, elapsed):
+    loaded = [s for s in summaries if s['error'] is None]
+    channels = [c for s in loaded for c in s['channels'].values()]
+    error_counts = [c['errors'] for c in channels if c['errors'] is not None]
+    confidences = [s['baud_confidence'] for s in loaded
+                   if s['baud_confidence'] is not None]
+    samples = sum(s['samples'] for s in loaded)
+    return {
+        'files': len(summaries),
+        'failed': len(summaries) - len(loaded),
+        'samples': samples,
+        'frames': sum(c['frames'] for c in channels),
+        'bytes': sum(c['bytes'] for c in channels),
+        'errors': sum(error_counts) if error_counts else None,
+        'bauds': dict(Counter(s['baud'] for s in loaded
+                              if s['baud'] is not None)),
+        'min_baud_confidence': min(confidences) if confidences else None,
+        'seconds': elapsed,
+        'samples_per_second': samples / elapsed if elapsed else None}
@@ -0,0 +1,19 @@
+"""
+Helpers shared by the analyzers for working with channel bits, bytes objects
+holding one 0 or 1 per sample.
+"""
+
+
+def bits_to_int(bits, start, count, msb_first=False):
+    """
+    Returns the value of count bits, stored as 0's and 1's in bits beginning
+    at start, LSB first unless msb_first is True.
+    """
+    word = bits[start:start + count]
+    if not msb_first:
+        word = word[::-1]
+    return int(word.translate(ASCII_BITS), 2)
+
+
+# Translation table from 0 and 1 values to their ascii digits.
+ASCII_BITS = bytes.maketrans(b'\x00\x01', b'01')
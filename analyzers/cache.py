@@ -0,0 +1,159 @@
+"""
+Memoization of analyzer results.
+"""
+
+import sys
+from array import array
+from collections import OrderedDict
+
+import analyzers
+
+
+class LabelArrays:
+    """
+    The labels of a single waveform stored as compact arrays.
+
+    Behaves as a sequence of (x, width, value) tuples sorted by x.
+
+    Parameters
+    ----------
+    labels : iterable of tuple
+        The (x, width, value) labels.
+
+    Examples
+    --------
+    >>> labels = LabelArrays([(40.0, 8.0, 0x3c), (4.0, 8.0, 0xa5)])
+    >>> list(labels), labels[1]
+    ([(4.0, 8.0, 165), (40.0, 8.0, 60)], (40.0, 8.0, 60))
+    >>> type(labels.values).__name__, len(labels)
+    ('array', 2)
+
+    Protocol events keep their str values:
+
+    >>> events = LabelArrays([(0.0, 1.0, 'S'), (9.0, 1.0, 0x50)])
+    >>> events.values
+    ('S', 80)
+    """
+    def __init__(self, labels):
+        labels = sorted(labels, key=lambda l: l[0])
+        self.x = array('d', [l[0] for l in labels])
+        self.width = array('d', [l[1] for l in labels])
+        values = [l[2] for l in labels]
+        if all(isinstance(v, int) for v in values):
+            self.values = array('l', values)
+        else:
+            # Protocol events have str values.
+            self.values = tuple(values)
+
+    @property
+    def nbytes(self):
+        """
+        The approximate memory used by the labels in bytes.
+        """
+        size = (self.x.itemsize * len(self.x) +
+                self.width.itemsize * len(self.width))
+        if isinstance(self.values, array):
+            return size + self.values.itemsize * len(self.values)
+        return size + sum(sys.getsizeof(v) for v in self.values) + \
+            sys.getsizeof(self.values)
+
+    def __len__(self):
+        return len(self.x)
+
+    def __getitem__(self, i):
+        return self.x[i], self.width[i], self.values[i]
+
+    def __iter__(self):
+        return zip(self.x, self.width, self.values)
+
+
+class DecodeCache:
+    """
+    A least recently used cache of analyzer labels keyed by acquisition
+    fingerprint, analyzer name and options.
+
+    Parameters
+    ----------
+    max_bytes : int
+        Results are evicted, oldest first, once the cached labels use more
+        memory than this.
+
+    Examples
+    --------
+    >>> from models import Acquisition
+    >>> first, second, third = (Acquisition([[0], [0], [0], [0]], rate)
+    ...                         for rate in (1000, 2000, 3000))
+    >>> labels = [[(0.0, 8.0, 0x55)]]
+    >>> cache = DecodeCache(2 * LabelArrays(labels[0]).nbytes)
+    >>> stored = cache.put('USART', first, {}, labels)
+    >>> list(stored[0])
+    [(0.0, 8.0, 85)]
+    >>> stored = cache.put('USART', second, {}, labels)
+
+    get moves an entry to the most recently used end, so the next put over
+    max_bytes evicts the second acquisition rather than the first:
+
+    >>> cache.get('USART', first, {}) is not None
+    True
+    >>> stored = cache.put('USART', third, {}, labels)
+    >>> [cache.get('USART', a, {}) is not None
+    ...  for a in (first, second, third)]
+    [True, False, True]
+    >>> cache.nbytes == cache.max_bytes
+    True
+    """
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._entries = OrderedDict()
+
+    @staticmethod
+    def key(name, acquisition, options):
+        return (acquisition.fingerprint, name.lower(),
+                tuple(sorted(options.items())))
+
+    def get(self, name, acquisition, options):
+        """
+        Returns the cached labels, or None if they have not been computed.
+        """
+        key = self.key(name, acquisition, options)
+        if key not in self._entries:
+            return None
+        self._entries.move_to_end(key)
+        return self._entries[key]
+
+    def put(self, name, acquisition, options, labels):
+        """
+        Stores labels, a list with the labels of each waveform, and returns
+        them converted to LabelArrays.
+        """
+        key = self.key(name, acquisition, options)
+        labels = [l if isinstance(l, LabelArrays) else LabelArrays(l)
+                  for l in labels]
+        if key in self._entries:
+            self.nbytes -= self._size(self._entries.pop(key))
+        self._entries[key] = labels
+        self.nbytes += self._size(labels)
+        while self.nbytes > self.max_bytes and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            self.nbytes -= self._size(evicted)
+        return labels
+
+    def labels(self, name, acquisition, **options):
+        """
+        Returns the labels of the analyzer registered as name with options
+        for acquisition, running the analyzer only on a cache miss.
+        """
+        labels = self.get(name, acquisition, options)
+        if labels is None:
+            analyzer = analyzers.create(name, acquisition, **options)
+            labels = self.put(name, acquisition, options, analyzer.labels())
+        return labels
+
+    def clear(self):
+        self._entries.clear()
+        self.nbytes = 0
+
+    @staticmethod
+    def _size(labels):
+        return sum(l.nbytes for l in labels)
@@ -0,0 +1,157 @@
+"""
+I2C analyzer.
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import compress
+from operator import and_
+
+from analyzers.bits import bits_to_int
+
+
+class I2CAnalyzer:
+    """
+    I2C acquisition analyzer.
+
+    Besides the data bytes, labels are produced for START, repeated START
+    and STOP conditions, the address and R/W bit following each START, and
+    the ACK or NACK of every byte. These labels carry a str value.
+
+    Parameters
+    ----------
+    acquisition : Acquisition
+        The Acquisition object to analyze.
+
+    Examples
+    --------
+    Each transfer below is a START, a list of (byte, acknowledged) pairs
+    and a STOP, every SCL and SDA state lasts 2 samples:
+
+    >>> from models import Acquisition
+    >>> def i2c(*transfers):
+    ...     states = [(1, 1)]
+    ...     for transfer in transfers:
+    ...         states += [(1, 0), (0, 0)]
+    ...         for byte, ack in transfer:
+    ...             bits = [(byte >> n) & 1 for n in range(7, -1, -1)]
+    ...             for bit in bits + [1 - ack]:
+    ...                 states += [(0, bit), (1, bit), (0, bit)]
+    ...         states += [(0, 0), (1, 0), (1, 1)]
+    ...     scl = [scl for scl, sda in states for _ in range(2)]
+    ...     sda = [sda for scl, sda in states for _ in range(2)]
+    ...     return Acquisition([scl, sda, [0] * len(scl), [0] * len(scl)])
+    >>> acquisition = i2c([(0xA0, True), (0x3C, False)],
+    ...                   [(0xA1, True), (0x7E, False)])
+    >>> labels = I2CAnalyzer(acquisition).labels()[1]
+    >>> labels[:3]
+    [(2, 3.0, 'S'), (5.0, 48.0, 'W 0x50'), (53.0, 6.0, 'A')]
+    >>> [value for x, width, value in labels]
+    ['S', 'W 0x50', 'A', 60, 'N', 'P', 'S', 'R 0x50', 'A', 126, 'N', 'P']
+    """
+    channel_names = ['SCL', 'SDA', 'Ch 2', 'Ch 3']
+
+    START = 'S'
+    REPEATED_START = 'Sr'
+    STOP = 'P'
+    ACK = 'A'
+    NACK = 'N'
+
+    def __init__(self, acquisition):
+        self.acquisition = acquisition
+
+    def labels(self):
+        length = self.acquisition.acquisition_length
+        if length == 0:
+            return [[], [], [], []]
+        rising = self.acquisition[0].rising_edges()
+        conditions = self._conditions()
+        stops = [pos for pos, _ in conditions[1:]] + [length]
+
+        # Sample SDA at the SCL rising edges of every complete byte (8 data
+        # bits and the ACK) following a START or repeated START.
+        positions = array('l')
+        spans = []
+        for (start, condition), stop in zip(conditions, stops):
+            lo = bisect_right(rising, start)
+            hi = bisect_left(rising, stop) if condition != self.STOP else lo
+            hi -= (hi - lo) % 9
+            spans.append((len(positions), len(positions) + hi - lo))
+            positions.extend(rising[lo:hi])
+        gathered = self.acquisition[1].values_at(positions)
+
+        labels = []
+        address = None
+        period = 1
+        for (start, condition), (lo, hi) in zip(conditions, spans):
+            frame = [self._byte(positions, gathered, i)
+                     for i in range(lo, hi, 9)]
+            if frame:
+                labels.append((start, max(frame[0][0] - start, 1), condition))
+                period = frame[-1][1] / 8.0
+            else:
+                labels.append((start, period, condition))
+                continue
+
+            (x, width, value, ack), frame = frame[0], frame[1:]
+            rw = 'R' if value & 1 else 'W'
+            if value >> 3 != 0b11110:
+                address = None
+                text = '%s 0x%02X' % (rw, value >> 1)
+            else:
+                # 10-bit address, a write carries the low 8 bits in the next
+                # byte while a read reuses the last address written.
+                if rw == 'W' and frame:
+                    address = ((value >> 1) & 0b11) << 8 | frame[0][2]
+                    labels.append((x, width, '%s 0x%03X' % (rw, address)))
+                    labels.append(ack)
+                    x, width, value, ack = frame.pop(0)
+                    labels.append(ack)
+                    text = None
+                elif address is not None:
+                    text = '%s 0x%03X' % (rw, address)
+                else:
+                    text = '%s 0x%03X' % (rw, ((value >> 1) & 0b11) << 8)
+            if text is not None:
+                labels.append((x, width, text))
+                labels.append(ack)
+            for x, width, value, ack in frame:
+                labels.append((x, width, value))
+                labels.append(ack)
+        return [[], labels, [], []]
+
+    def _byte(self, positions, gathered, i):
+        """
+        Returns (x, width, value, ack_label) for the byte whose first bit is
+        at index i of positions and gathered.
+        """
+        period = (positions[i + 8] - positions[i]) / 8.0
+        value = bits_to_int(gathered, i, 8, msb_first=True)
+        ack = (positions[i + 8] - period / 2, period,
+               self.NACK if gathered[i + 8] else self.ACK)
+        return positions[i] - period / 2, 8 * period, value, ack
+
+    def _conditions(self):
+        """
+        Returns a list of (position, condition) tuples for every START,
+        repeated START and STOP condition, in order.
+        """
+        scl = self.acquisition[0]
+        sda = self.acquisition[1]
+        edges = sda.edges()
+        # Conditions are SDA transitions while SCL is high on both sides.
+        high = bytes(map(and_, scl.values_at(edges),
+                         scl.values_at([e - 1 for e in edges])))
+        first = sda[0]
+        conditions = []
+        in_frame = False
+        for k in compress(range(len(edges)), high):
+            # Edge k leaves SDA at first ^ ((k + 1) & 1), falling is START.
+            if first ^ ((k + 1) & 1) == 0:
+                condition = self.REPEATED_START if in_frame else self.START
+                in_frame = True
+            else:
+                condition = self.STOP
+                in_frame = False
+            conditions.append((edges[k], condition))
+        return conditions
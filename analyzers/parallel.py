@@ -0,0 +1,200 @@
+"""
+Running analyzers on a concurrent.futures executor.
+
+Analyzers that define waveform_labels(waveform_i) are split into one task per
+waveform, so for example the USART RX and TX channels are decoded on separate
+cores when a process pool is used.
+
+The samples are not pickled with every task. They are written once per job to
+a temporary file, each worker process memory maps it on its first task and
+keeps the acquisition for the other tasks of the job. Only the analyzer state
+without its acquisition, such as the autobaud result, is sent with each task.
+"""
+
+import concurrent.futures
+import mmap
+import os
+import tempfile
+
+import analyzers
+from models import Acquisition
+
+# The (fingerprint, Acquisition) most recently loaded by this worker process.
+_shared = None
+
+
+def _labels(analyzer):
+    return analyzer.labels()
+
+
+def _waveform_labels(analyzer, waveform_i):
+    return analyzer.waveform_labels(waveform_i)
+
+
+def _load_shared(path, fingerprint, channel_count, sample_rate):
+    global _shared
+    if _shared is None or _shared[0] != fingerprint:
+        with open(path, 'rb') as f, \
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            samples = m[:]
+        _shared = (fingerprint, Acquisition.from_samples(
+            samples, channel_count, sample_rate))
+    return _shared[1]
+
+
+def _shared_labels(shared, cls, state, waveform_i=None):
+    # Rebuilds the analyzer around the acquisition in the shared file.
+    analyzer = cls.__new__(cls)
+    analyzer.__dict__.update(state)
+    analyzer.acquisition = _load_shared(*shared)
+    if waveform_i is None:
+        return analyzer.labels()
+    return analyzer.waveform_labels(waveform_i)
+
+
+class AnalysisJob:
+    """
+    A single analysis of an acquisition that can be cancelled.
+
+    Parameters
+    ----------
+    executor : concurrent.futures.Executor
+        The executor the decoding tasks are submitted to. If None they are
+        run one after another on the thread calling run, where a profiler
+        can see them.
+    name : str
+        The registered analyzer name.
+    acquisition : Acquisition
+        The acquisition to analyze.
+    options : dict
+        The analyzer options.
+
+    An empty acquisition has nothing to share with the workers and is
+    decoded on the thread calling run.
+
+    Examples
+    --------
+    >>> from concurrent.futures import ThreadPoolExecutor
+    >>> from models import Acquisition
+    >>> empty = Acquisition([[], [], [], []])
+    >>> with ThreadPoolExecutor() as executor:
+    ...     for name in ('USART', 'SPI', 'I2C'):
+    ...         print(name, AnalysisJob(executor, name, empty, {}).run())
+    USART [[], [], [], []]
+    SPI [[], [], [], []]
+    I2C [[], [], [], []]
+    """
+    def __init__(self, executor, name, acquisition, options):
+        self.executor = executor
+        self.name = name
+        self.acquisition = acquisition
+        self.options = options
+        self.cancelled = False
+        self._futures = []
+        self._shared_path = None
+
+    def run(self, progress=None):
+        """
+        Runs the analysis and blocks until it is complete.
+
+        Parameters
+        ----------
+        progress : callable
+            Called as progress(done, total) each time a task completes.
+
+        Returns
+        -------
+        List of List of tuple
+            The labels of each waveform, or None if the job was cancelled.
+        """
+        # Creating the analyzer may autobaud, so it is done here rather than
+        # on the caller's thread.
+        analyzer = analyzers.create(self.name, self.acquisition,
+                                    **self.options)
+        if self.cancelled:
+            return None
+        per_waveform = hasattr(analyzer, 'waveform_labels')
+        waveforms = (range(len(self.acquisition)) if per_waveform
+                     else [None])
+        # An empty file can not be memory mapped by the workers.
+        inline = (self.executor is None or
+                  not self.acquisition.acquisition_length)
+        if inline or self.acquisition.run_length:
+            # Edges are compact enough to be pickled with the analyzer.
+            tasks = [(_waveform_labels, (analyzer, n)) if per_waveform
+                     else (_labels, (analyzer,)) for n in waveforms]
+            if inline:
+                return self._run_inline(tasks, per_waveform, progress)
+            return self._run_tasks(tasks, per_waveform, progress)
+        state = dict(analyzer.__dict__)
+        del state['acquisition']
+        shared = self._share()
+        try:
+            tasks = [(_shared_labels, (shared, type(analyzer), state, n))
+                     for n in waveforms]
+            return self._run_tasks(tasks, per_waveform, progress)
+        finally:
+            self._unshare()
+
+    def _run_tasks(self, tasks, per_waveform, progress):
+        self._futures = [self.executor.submit(fn, *args)
+                         for fn, args in tasks]
+        futures = self._futures
+
+        try:
+            for done, future in enumerate(
+                    concurrent.futures.as_completed(futures), 1):
+                if self.cancelled:
+                    return None
+                future.result()
+                if progress is not None:
+                    progress(done, len(futures))
+        except concurrent.futures.CancelledError:
+            return None
+
+        if self.cancelled:
+            return None
+        if per_waveform:
+            return [future.result() for future in futures]
+        return futures[0].result()
+
+    def _share(self):
+        """
+        Writes the samples to a temporary file for the workers, returns the
+        arguments of _load_shared.
+        """
+        fd, self._shared_path = tempfile.mkstemp(prefix='logician-',
+                                                 suffix='.samples')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(self.acquisition.samples)
+        return (self._shared_path, self.acquisition.fingerprint,
+                self.acquisition.channel_count, self.acquisition.sample_rate)
+
+    def _unshare(self):
+        # Workers that still have the file mapped keep their view of it.
+        path = self._shared_path
+        if path is not None:
+            self._shared_path = None
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _run_inline(self, tasks, per_waveform, progress):
+        results = []
+        for done, (fn, args) in enumerate(tasks, 1):
+            if self.cancelled:
+                return None
+            results.append(fn(*args))
+            if progress is not None:
+                progress(done, len(tasks))
+        return results if per_waveform else results[0]
+
+    def cancel(self):
+        """
+        Cancels the job. Tasks that have not started are dropped, tasks that
+        are already running finish but their results are discarded.
+        """
+        self.cancelled = True
+        for future in self._futures:
+            future.cancel()
@@ -0,0 +1,123 @@
+"""
+SPI analyzer.
+"""
+
+from array import array
+from bisect import bisect_left
+
+from analyzers.bits import bits_to_int
+
+
+class SPIAnalyzer:
+    """
+    SPI acquisition analyzer.
+
+    Parameters
+    ----------
+    acquisition : Acquisition
+        The Acquisition object to analyze.
+    cpol : int
+        The clock polarity, the level of CLK when idle.
+    cpha : int
+        The clock phase, 0 if data is sampled on the leading clock edge, 1
+        if it is sampled on the trailing edge.
+    msb_first : bool
+        True if the most significant bit of each word is sent first.
+    word_size : int
+        The number of bits in each word.
+    cs_polarity : int or None
+        The level of CS while the slave is selected, or None if CS is not
+        used and the whole acquisition is a single transfer.
+
+    Examples
+    --------
+    Each data bit is held for a whole clock period, the clock is idle for
+    the first half of the period when cpha is 0 and for the second half when
+    it is 1:
+
+    >>> from models import Acquisition
+    >>> def spi(words, cpol, cpha, msb_first=True):
+    ...     clk, mosi, miso = [cpol] * 4, [0] * 4, [0] * 4
+    ...     for word in words:
+    ...         bits = [(word >> n) & 1 for n in range(8)]
+    ...         halves = [cpol, 1 - cpol] if cpha == 0 else [1 - cpol, cpol]
+    ...         for bit in (bits[::-1] if msb_first else bits):
+    ...             clk += [halves[0]] * 2 + [halves[1]] * 2
+    ...             mosi += [bit] * 4
+    ...             miso += [1 - bit] * 4
+    ...     clk += [cpol] * 4
+    ...     mosi += [0] * 4
+    ...     miso += [0] * 4
+    ...     cs = [1] * 2 + [0] * (len(clk) - 4) + [1] * 2
+    ...     return Acquisition([clk, mosi, miso, cs])
+    >>> labels = SPIAnalyzer(spi([0xA5, 0x3C], 0, 0), 0, 0).labels()
+    >>> [(x, width, hex(value)) for x, width, value in labels[1]]
+    [(6, 32.0, '0xa5'), (38, 32.0, '0x3c')]
+    >>> [hex(value) for x, width, value in labels[2]]
+    ['0x5a', '0xc3']
+
+    Every clock mode and bit order decodes its own signal:
+
+    >>> from itertools import product
+    >>> all([v for x, w, v in SPIAnalyzer(
+    ...         spi([0xA5, 0x3C], cpol, cpha, msb_first), cpol, cpha,
+    ...         msb_first).labels()[1]] == [0xA5, 0x3C]
+    ...     for cpol, cpha, msb_first in product((0, 1), (0, 1),
+    ...                                          (True, False)))
+    True
+    """
+    channel_names = ['CLK', 'MOSI', 'MISO', 'CS']
+
+    def __init__(self, acquisition, cpol=0, cpha=0, msb_first=True,
+                 word_size=8, cs_polarity=0):
+        self.acquisition = acquisition
+        self.cpol = cpol
+        self.cpha = cpha
+        self.msb_first = msb_first
+        self.word_size = word_size
+        self.cs_polarity = cs_polarity
+
+    def labels(self):
+        clk = self.acquisition[0]
+        # Modes 0 and 3 sample on the rising edge, modes 1 and 2 on the
+        # falling edge.
+        if self.cpol == self.cpha:
+            edges = clk.rising_edges()
+        else:
+            edges = clk.falling_edges()
+
+        # Sample positions of every complete word, and the word boundaries.
+        positions = array('l')
+        for start, stop in self._transfers():
+            lo = bisect_left(edges, start)
+            hi = bisect_left(edges, stop)
+            hi -= (hi - lo) % self.word_size
+            positions.extend(edges[lo:hi])
+
+        ws = self.word_size
+        word_starts = positions[0::ws]
+        word_ends = positions[ws - 1::ws]
+        labels = [[], [], [], []]
+        for waveform_i in (1, 2):
+            gathered = self.acquisition[waveform_i].values_at(positions)
+            labels[waveform_i] = [
+                (x0, (x1 - x0) * ws / max(ws - 1, 1) or 1,
+                 bits_to_int(gathered, k*ws, ws, self.msb_first))
+                for k, (x0, x1) in enumerate(zip(word_starts, word_ends))]
+        return labels
+
+    def _transfers(self):
+        """
+        Returns a list of (start, stop) ranges during which CS selects the
+        slave.
+        """
+        length = self.acquisition.acquisition_length
+        if length == 0:
+            return []
+        if self.cs_polarity is None:
+            return [(0, length)]
+        cs = self.acquisition[3]
+        bounds = [0] + list(cs.edges()) + [length]
+        first = 0 if cs[0] == self.cs_polarity else 1
+        return [(bounds[k], bounds[k + 1])
+                for k in range(first, len(bounds) - 1, 2)]
@@ -0,0 +1,322 @@
+"""
+USART analyzer and streaming decoder.
+"""
+
+import re
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from itertools import accumulate
+
+import models
+from analyzers.bits import bits_to_int
+
+
+def estimate_bit_size(widths, tolerance=0.25, min_support=0.02,
+                      max_multiple=10, min_bit_size=2):
+    """
+    Estimates the length of a single bit from a list of pulse widths.
+
+    Every width of at least min_bit_size samples that is shared by at least
+    min_support of the pulses, and by at least 2 of them, is a candidate, so
+    isolated glitches are ignored. Each candidate is refined by fitting every
+    pulse that lies within tolerance of a whole number of bits, up to
+    max_multiple bits long, and the candidate that fits the most pulses is
+    chosen.
+
+    Parameters
+    ----------
+    widths : list of int
+        The pulse widths in samples.
+    tolerance : float
+        The allowed deviation from a whole number of bits, as a fraction of
+        a bit.
+    min_support : float
+        The fraction of pulses that must be close to a width for it to be
+        considered a single bit.
+    max_multiple : int
+        Longer pulses, such as idle time, are ignored.
+    min_bit_size : int
+        The shortest bit considered. Within tolerance every width is a whole
+        number of 1 sample bits, so such a guess would always fit.
+
+    Returns
+    -------
+    tuple
+        (bit_size, confidence), where confidence is the fraction of the
+        considered pulses that are a whole number of bits long, pulses
+        shorter than half a bit count against it. bit_size is None if there
+        were no pulses.
+
+    Examples
+    --------
+    A 1 sample glitch is not taken for a bit, but lowers the confidence:
+
+    >>> bit_size, confidence = estimate_bit_size([9, 9, 17, 1, 26, 9, 8, 9])
+    >>> round(bit_size, 2), confidence
+    (8.7, 0.875)
+    >>> estimate_bit_size([9, 9, 17, 1, 1, 26, 9, 8, 9])[1]
+    0.7777777777777778
+    """
+    histogram = Counter(widths)
+    if not histogram:
+        return None, 0.0
+    values = sorted(histogram)
+    cumulative = list(accumulate(histogram[v] for v in values))
+    needed = max(2, min_support * len(widths))
+
+    def support(width):
+        hi = bisect_right(values, width * (1 + tolerance))
+        lo = bisect_left(values, width * (1 - tolerance))
+        return cumulative[hi - 1] - (cumulative[lo - 1] if lo else 0)
+
+    def fit(guess):
+        # Returns the refined guess and the fraction of pulses it fits.
+        for _ in range(2):
+            fitted = considered = total_width = total_bits = 0
+            for value in values:
+                bits = int(round(value / guess))
+                if bits > max_multiple:
+                    break
+                count = histogram[value]
+                considered += count
+                if bits and abs(value - bits * guess) <= tolerance * guess:
+                    fitted += count
+                    total_width += value * count
+                    total_bits += bits * count
+            if total_bits:
+                guess = float(total_width) / total_bits
+        return guess, float(fitted) / considered if considered else 0.0
+
+    # One candidate per cluster of widths within tolerance of each other.
+    candidates = []
+    for value in values:
+        if value < min_bit_size or support(value) < needed:
+            continue
+        if candidates and value <= candidates[-1] * (1 + tolerance):
+            continue
+        candidates.append(value)
+    if not candidates:
+        candidates = [max(values[0], min_bit_size)]
+    # max keeps the first, shortest, of equally good candidates.
+    return max((fit(c) for c in candidates), key=lambda f: f[1])
+
+
+# Matches a 1 followed by a 0 in channel bits.
+_FALLING_EDGE = re.compile(b'\x01\x00')
+
+
+class USARTAnalyzer:
+    """
+    USART acquisition analyzer.
+
+    Parameters
+    ----------
+    acquisition : Acquisition
+        The Acquisition object to analyze.
+    baud : int
+        If None autobaud is attempted, otherwise the baudrate of the
+        acquisition.
+    bit_count : int
+        The number of data bits per frame.
+    """
+    channel_names = ['RX', 'TX', 'Ch 2', 'Ch 3']
+    standard_bauds = [300, 1200, 2400, 4800, 9600, 19200, 38400, 57600,
+                      115200]
+    baud_tolerance = 0.05
+
+    def __init__(self, acquisition, baud=None, bit_count=8):
+        self.acquisition = acquisition
+        self.parity = None
+        self.bit_count = bit_count
+        self.baud_confidence = None
+        if baud is None:
+            self._autobaud()
+        else:
+            self.baud = baud
+            self.bit_size = float(acquisition.sample_rate) / self.baud
+
+    def _autobaud(self):
+        """
+        Attempts to find the size of 1 bit in the acquired data from a
+        histogram of the pulse widths on the RX and TX channels.
+
+        The estimated baud is snapped to a standard baud rate only when it is
+        within baud_tolerance of it, and the fraction of pulses that agree
+        with the estimate is stored in baud_confidence.
+
+        Notes
+        -----
+        This algorithim may be inaccurate if the data does not contain isolated
+        bits. For example if the decimal value 51 (0b00110011) was transmited
+        the calculated autobaud would be inaccurate by a factor of two.
+        """
+        widths = (list(self.acquisition[0].pulse_widths()) +
+                  list(self.acquisition[1].pulse_widths()))
+        bit_size, self.baud_confidence = estimate_bit_size(
+            widths, max_multiple=self.bit_count + 2)
+        if bit_size is None:
+            bit_size = max(self.acquisition.acquisition_length, 1)
+        baud = self.acquisition.sample_rate / bit_size
+        # Check to see if we are close to a standard baud rate
+        for b in self.standard_bauds:
+            if abs(baud - b) <= b * self.baud_tolerance:
+                baud = b
+                break
+        self.baud = baud
+        self.bit_size = float(self.acquisition.sample_rate) / self.baud
+
+    def labels(self):
+        return [self.waveform_labels(n)
+                for n in range(len(self.acquisition))]
+
+    def decoder(self, waveform_i):
+        """
+        Returns a streaming decoder for the given waveform using the bit size
+        of this analyzer.
+        """
+        return USARTDecoder(self.bit_size, self.bit_count, waveform_i)
+
+    def waveform_labels(self, waveform_i):
+        """
+        Returns the labels for the given waveform.
+
+        Parameters
+        ----------
+        waveform_i : int
+            The index of the wavefrom to encode.
+
+        Returns
+        -------
+        List of tuples
+            Returns a list of tuples in form: [(x0, width, value), ...],
+            where x0 is the float approximation of the index of the leading
+            edge of the first data bit of each byte.
+        """
+        decoder = self.decoder(waveform_i)
+        labels = []
+        for chunk in self.acquisition.iter_chunks():
+            labels.extend(decoder.feed(chunk))
+        return labels
+
+    def frame_errors(self, waveform_i, labels):
+        """
+        Returns the labels of the frames with a framing error, a low stop
+        bit.
+
+        Parameters
+        ----------
+        waveform_i : int
+            The index of the waveform the labels were decoded from.
+        labels : list of tuples
+            The labels returned by waveform_labels(waveform_i).
+        """
+        length = self.acquisition.acquisition_length
+        # The stop bit follows the data bits, sample it at its center.
+        positions = [min(int(x + width + self.bit_size / 2), length - 1)
+                     for x, width, value in labels]
+        stop_bits = self.acquisition[waveform_i].values_at(positions)
+        return [label for label, bit in zip(labels, stop_bits) if not bit]
+
+
+class USARTDecoder:
+    """
+    Streaming USART decoder for a single channel.
+
+    Chunks of samples are fed in order and the frames completed by each chunk
+    are returned. A frame split across chunks is carried over, so at most one
+    frame of samples is held between calls.
+
+    Parameters
+    ----------
+    bit_size : float
+        The length of one bit in samples.
+    bit_count : int
+        The number of data bits per frame.
+    channel : int
+        The channel to decode from the packed samples.
+
+    Examples
+    --------
+    >>> def frame(value, bit_size=4):
+    ...     bits = [0] + [(value >> n) & 1 for n in range(8)] + [1]
+    ...     return b''.join(bytes([bit]) * bit_size for bit in bits)
+    >>> samples = (b'\x01' * 10 + frame(0x55) + b'\x01' * 3 + frame(0xA3) +
+    ...            frame(0x00) + b'\x01' * 5)
+    >>> labels = USARTDecoder(4.0).feed(samples)
+    >>> [(x, width, hex(value)) for x, width, value in labels]
+    [(14.0, 32.0, '0x55'), (57.0, 32.0, '0xa3'), (97.0, 32.0, '0x0')]
+
+    The labels do not depend on how the samples are split into chunks:
+
+    >>> def feed_in_chunks(samples, size):
+    ...     decoder = USARTDecoder(4.0)
+    ...     return [label for i in range(0, len(samples), size)
+    ...             for label in decoder.feed(samples[i:i + size])]
+    >>> all(feed_in_chunks(samples, size) == labels
+    ...     for size in range(1, len(samples) + 1))
+    True
+    """
+    def __init__(self, bit_size, bit_count=8, channel=0):
+        self.bit_size = bit_size
+        self.bit_count = bit_count
+        self.channel = channel
+        self._frame_size = int(bit_size * bit_count)
+        # Offsets of the bit centers from the start bit's falling edge.
+        self._offsets = [int(bit_size + (n*bit_size + (bit_size / 2)))
+                         for n in range(bit_count)]
+        self.reset()
+
+    def reset(self):
+        """
+        Forgets any carried over frame, the next chunk starts a new stream.
+        """
+        self._buffer = b''
+        self._offset = 0
+        self._search = 0
+
+    def feed(self, samples):
+        """
+        Decodes the next chunk of samples.
+
+        Parameters
+        ----------
+        samples : bytes
+            Packed samples, one byte per sample, following the previous chunk.
+
+        Returns
+        -------
+        List of tuples
+            The (x0, width, value) labels of the frames completed by this
+            chunk, with x0 counted from the first sample ever fed.
+        """
+        bits = self._buffer + models.Channel(samples, self.channel).bits()
+        last = self._offsets[-1]
+        # Each start bit is the first falling edge after the previous frame,
+        # a match at i is a falling edge at i + 1.
+        starts = []
+        pos = max(self._search - self._offset, 0)
+        while True:
+            match = _FALLING_EDGE.search(bits, pos)
+            if match is None:
+                keep = len(bits) - 1
+                break
+            start = match.start() + 1
+            if start + last >= len(bits):
+                # Incomplete frame, keep it and its edge for the next chunk.
+                keep = start - 1
+                break
+            starts.append(start)
+            pos = start + self._frame_size
+
+        positions = [s + o for s in starts for o in self._offsets]
+        gathered = bytes(map(bits.__getitem__, positions))
+        labels = [(self._offset + s + self.bit_size,
+                   self.bit_size * self.bit_count,
+                   bits_to_int(gathered, k*self.bit_count, self.bit_count))
+                  for k, s in enumerate(starts)]
+
+        keep = max(keep, 0)
+        self._search = self._offset + pos
+        self._buffer = bits[keep:]
+        self._offset += keep
+        return labels
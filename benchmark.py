@@ -0,0 +1,464 @@
+#!/usr/bin/env python3
+"""
+Benchmarks of the load, decode, analyze and render hot paths.
+
+Synthetic captures of each size are generated from a fixed seed, with USART
+traffic on channels 0 and 1 and a dense burst signal on channel 2. Every
+benchmark is timed repeat times and the best and median times are reported
+along with the throughput in samples per second and the peak memory
+allocated by Python during one further run.
+
+Results are compared with a stored baseline. A benchmark whose median time is
+slower than its baseline median by more than the tolerance, and by more than
+the run to run spread of either measurement allows, is reported as a
+regression, as is a benchmark with no baseline at any size, and the exit
+status is 1.
+
+    python3 benchmark.py --no-render
+    python3 benchmark.py --sizes 10K,1M --only usart
+    python3 benchmark.py --no-render --save-baseline benchmark_baseline.json
+
+The render benchmarks paint into an offscreen QImage and need PySide, without
+it the exit status is 2 unless they are skipped with --no-render. Their
+results depend on the Qt build, so they have a baseline of their own,
+benchmark_render_baseline.json, recorded with make render-baseline and
+compared with make bench-render.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import analyzers.usart
+import models
+
+SAMPLE_RATE = 1000000
+BAUD = 115200
+DEFAULT_SIZES = '10K,100K,1M,10M'
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                'benchmark_baseline.json')
+DEFAULT_REPEAT = 10
+# Slowdowns within this many median absolute deviations of the run times are
+# ignored as noise.
+NOISE_DEVIATIONS = 3
+EDGE_LOOKUPS = 10000
+RENDER_WIDTH = 1000
+RENDER_HEIGHT = 100
+# Columns repainted by render_partial, as when a small part of the view is
+# exposed.
+RENDER_PARTIAL_WIDTH = 100
+RENDER_BENCHMARKS = ('render_overview', 'render_zoomed', 'render_partial')
+
+
+def parse_size(text):
+    """
+    Returns the number of samples for text such as '10K', '1M' or '5000'.
+    """
+    text = text.strip().upper()
+    multiplier = {'K': 1000, 'M': 1000000}.get(text[-1:], 1)
+    if multiplier != 1:
+        text = text[:-1]
+    return int(float(text) * multiplier)
+
+
+def usart_bits(length, rng, bit_size=float(SAMPLE_RATE) / BAUD):
+    """
+    Returns length samples of 0's and 1's carrying random 8N1 USART frames
+    separated by random idle times.
+    """
+    frames = []
+    for value in range(256):
+        bits = [0] + [(value >> n) & 1 for n in range(8)] + [1]
+        frames.append(b''.join(
+            bytes([bit]) * (int(round((k + 1) * bit_size)) -
+                            int(round(k * bit_size)))
+            for k, bit in enumerate(bits)))
+    pieces = []
+    total = 0
+    while total < length:
+        piece = (b'\x01' * int(rng.randrange(20) * bit_size) +
+                 frames[rng.randrange(256)])
+        pieces.append(piece)
+        total += len(piece)
+    return b''.join(pieces)[:length]
+
+
+def burst_bits(length, rng, block=1 << 16):
+    """
+    Returns length samples of 0's and 1's toggling every 1 to 5 samples, a
+    block of random runs is repeated to fill the length.
+    """
+    runs = []
+    value = 0
+    total = 0
+    while total < block:
+        width = rng.randint(1, 5)
+        runs.append(bytes([value]) * width)
+        value ^= 1
+        total += width
+    pattern = b''.join(runs)
+    return (pattern * (length // len(pattern) + 1))[:length]
+
+
+def synthetic_samples(length, seed=0):
+    """
+    Returns length packed samples: USART on channels 0 and 1, bursts on
+    channel 2 and a constant low channel 3.
+    """
+    rng = random.Random(seed)
+    packed = 0
+    for channel, bits in enumerate([usart_bits(length, rng),
+                                    usart_bits(length, rng),
+                                    burst_bits(length, rng)]):
+        # The channels hold 0 or 1 per byte, so the shifted integers OR
+        # together bytewise without carries.
+        packed |= int.from_bytes(bits, 'little') << channel
+    return packed.to_bytes(length, 'little')
+
+
+class Benchmark:
+    """
+    A single timed operation.
+
+    Parameters
+    ----------
+    name : str
+        The benchmark name.
+    setup : callable
+        Called as setup(fixture) before each run, returns the arguments of
+        run. Its time is not measured.
+    run : callable
+        The operation to time.
+    items : callable
+        Called as items(fixture), returns the number of items processed per
+        run, used for the throughput. By default the number of samples.
+    unit : str
+        The unit of items.
+    """
+    def __init__(self, name, setup, run, items=None, unit='S'):
+        self.name = name
+        self.setup = setup
+        self.run = run
+        self.items = items or (lambda fixture: fixture.length)
+        self.unit = unit
+
+    def measure(self, fixture, repeat):
+        """
+        Returns (seconds, peak bytes), the time of each of repeat runs and
+        the peak allocation of one further run.
+        """
+        times = []
+        for _ in range(repeat):
+            args = self.setup(fixture)
+            gc.collect()
+            start = time.perf_counter()
+            self.run(*args)
+            times.append(time.perf_counter() - start)
+        args = self.setup(fixture)
+        gc.collect()
+        tracemalloc.start()
+        self.run(*args)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return times, peak
+
+
+class Fixture:
+    """
+    The synthetic capture of one size and the files made from it.
+    """
+    def __init__(self, length, directory):
+        self.length = length
+        self.samples = synthetic_samples(length)
+        self.packed = models.pack_samples(self.samples)
+        self.acquisition = models.Acquisition.from_samples(
+            self.samples, 4, SAMPLE_RATE)
+        self.csv_path = os.path.join(directory, '%d.csv' % length)
+        self.acquisition.save_csv_file(self.csv_path)
+        self.capture_path = os.path.join(directory, '%d.lgc' % length)
+        self.acquisition.save_capture_file(self.capture_path)
+        rng = random.Random(length)
+        self.lookups = [rng.randrange(length) for _ in range(EDGE_LOOKUPS)]
+
+    def fresh_acquisition(self):
+        """
+        Returns a copy of the acquisition without cached edge indexes.
+        """
+        return models.Acquisition.from_samples(self.samples, 4, SAMPLE_RATE)
+
+
+def _edge_lookups(channel, positions):
+    for i in positions:
+        channel.run_at(i)
+
+
+def _indexed_channel(fixture):
+    channel = fixture.fresh_acquisition()[2]
+    channel.edges()
+    return channel
+
+
+def _usart_labels(acquisition):
+    analyzers.usart.USARTAnalyzer(acquisition, baud=BAUD).labels()
+
+
+def benchmarks(render=True):
+    """
+    Returns the list of Benchmarks, the render benchmarks are included if
+    render is True.
+
+    Raises
+    ------
+    ImportError
+        If render is True and PySide is not installed.
+    """
+    items = [
+        Benchmark('acquisition_from_bytes',
+                  lambda fixture: (fixture.packed,),
+                  lambda data: models.Acquisition(data, SAMPLE_RATE, 4)),
+        Benchmark('acquisition_from_csv',
+                  lambda fixture: (fixture.csv_path,),
+                  models.Acquisition),
+        Benchmark('acquisition_from_capture',
+                  lambda fixture: (fixture.capture_path,),
+                  models.Acquisition),
+        Benchmark('csv_string',
+                  lambda fixture: (fixture.fresh_acquisition(),),
+                  lambda acquisition: acquisition.csv_string()),
+        Benchmark('usart_autobaud',
+                  lambda fixture: (fixture.fresh_acquisition(),),
+                  analyzers.usart.USARTAnalyzer),
+        Benchmark('usart_decode',
+                  lambda fixture: (fixture.fresh_acquisition(),),
+                  _usart_labels),
+        Benchmark('edge_index',
+                  lambda fixture: (fixture.fresh_acquisition()[2],),
+                  lambda channel: channel.edges()),
+        # The lookup done by AnalyzerWidget.measurePulseWidth on mouse moves.
+        Benchmark('edge_lookup',
+                  lambda fixture: (_indexed_channel(fixture),
+                                   fixture.lookups),
+                  _edge_lookups,
+                  lambda fixture: len(fixture.lookups), 'lookups'),
+    ]
+    if render:
+        items.extend(_render_benchmarks())
+    return items
+
+
+def _render_benchmarks():
+    from PySide import QtCore, QtGui
+    from ui.widgets import AnalyzerChannelGraphicsItem
+
+    if QtGui.QApplication.instance() is None:
+        _render_benchmarks.app = QtGui.QApplication(sys.argv)
+
+    def setup(fixture, span, scale):
+        # Paints span samples in the middle of the capture at scale pixels
+        # per sample.
+        item = AnalyzerChannelGraphicsItem(
+            _indexed_channel(fixture), RENDER_HEIGHT,
+            QtGui.QPen(QtGui.QColor(0, 200, 0)))
+        span = min(span, fixture.length)
+        x0 = (fixture.length - span) // 2
+        image = QtGui.QImage(RENDER_WIDTH, RENDER_HEIGHT,
+                             QtGui.QImage.Format_ARGB32_Premultiplied)
+        option = QtGui.QStyleOptionGraphicsItem()
+        option.exposedRect = QtCore.QRectF(x0, 0, span, RENDER_HEIGHT)
+        return item, image, option, scale, x0
+
+    def paint(item, image, option, scale, x0):
+        image.fill(0)
+        painter = QtGui.QPainter(image)
+        painter.scale(scale, 1)
+        painter.translate(-x0, 0)
+        item.paint(painter, option, None)
+        painter.end()
+
+    frames = lambda fixture: 1
+    overview, zoomed, partial = RENDER_BENCHMARKS
+    return [
+        # The whole capture in RENDER_WIDTH pixels.
+        Benchmark(overview,
+                  lambda fixture: setup(fixture, fixture.length,
+                                        float(RENDER_WIDTH) / fixture.length),
+                  paint, frames, 'frames'),
+        # One sample per pixel.
+        Benchmark(zoomed, lambda fixture: setup(fixture, RENDER_WIDTH, 1.0),
+                  paint, frames, 'frames'),
+        # Two samples per pixel with only a few columns exposed, the bursts
+        # on channel 2 are drawn as activity bands.
+        Benchmark(partial,
+                  lambda fixture: setup(fixture, 2 * RENDER_PARTIAL_WIDTH,
+                                        0.5),
+                  paint, frames, 'frames'),
+    ]
+
+
+def run(sizes, repeat=DEFAULT_REPEAT, only=None, render=True, out=sys.stdout):
+    """
+    Runs the benchmarks for each size.
+
+    Returns
+    -------
+    dict
+        Maps 'name/size' to a dict of the best 'seconds', the 'median'
+        seconds and their median absolute 'deviation', the best
+        'throughput' in items per second, its 'unit' and the 'peak_bytes'.
+
+    Raises
+    ------
+    ImportError
+        If render is True and PySide is not installed.
+    """
+    results = {}
+    selected = [b for b in benchmarks(render)
+                if only is None or only in b.name]
+    out.write('%-34s %13s %13s %16s %12s\n' % (
+        'benchmark', 'best', 'median', 'throughput', 'peak'))
+    with tempfile.TemporaryDirectory(prefix='logician-bench') as directory:
+        for length in sizes:
+            fixture = Fixture(length, directory)
+            for benchmark in selected:
+                times, peak = benchmark.measure(fixture, repeat)
+                seconds = min(times)
+                median = statistics.median(times)
+                key = '%s/%d' % (benchmark.name, length)
+                results[key] = {
+                    'seconds': seconds,
+                    'median': median,
+                    'deviation': statistics.median(
+                        abs(t - median) for t in times),
+                    'throughput': benchmark.items(fixture) / seconds
+                    if seconds else None,
+                    'unit': benchmark.unit,
+                    'peak_bytes': peak}
+                out.write(format_result(key, results[key]) + '\n')
+                out.flush()
+    return results
+
+
+def format_result(key, result, baseline=None):
+    throughput = result['throughput'] or 0.0
+    if throughput >= 1e6:
+        rate = '%9.2f M%s/s' % (throughput / 1e6, result['unit'])
+    elif throughput >= 1e3:
+        rate = '%9.2f K%s/s' % (throughput / 1e3, result['unit'])
+    else:
+        rate = '%9.2f %s/s' % (throughput, result['unit'])
+    text = '%-34s %10.3f ms %10.3f ms %s %9.2f MB' % (
+        key, 1e3 * result['seconds'], 1e3 * result['median'], rate,
+        result['peak_bytes'] / 1e6)
+    if baseline is not None:
+        text += '   x%.2f' % (result['median'] / baseline['median'])
+    return text
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compares the median times of the results with the baseline.
+
+    Returns
+    -------
+    tuple
+        (regressions, missing), the keys of the results slower than their
+        baseline by more than the tolerance, a fraction of the baseline
+        median, and by more than NOISE_DEVIATIONS times the larger deviation
+        of the two, and the names of the benchmarks with no baseline at any
+        size.
+    """
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        limit = base['median'] * (1 + tolerance)
+        noise = NOISE_DEVIATIONS * max(result['deviation'],
+                                       base['deviation'])
+        if (result['median'] > limit and
+                result['median'] - base['median'] > noise):
+            regressions.append(key)
+    baselined = set(key.split('/')[0] for key in baseline)
+    missing = sorted(set(key.split('/')[0] for key in results) - baselined)
+    return regressions, missing
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Benchmark the load, decode, analyze and render paths.')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES,
+                        help='comma separated capture sizes in samples')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT,
+                        help='runs per benchmark, the best and median times '
+                             'are kept')
+    parser.add_argument('--only', metavar='TEXT',
+                        help='only run benchmarks with TEXT in their name')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE,
+                        help='baseline results to compare with')
+    parser.add_argument('--save-baseline', metavar='PATH',
+                        help='save the results as a new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed slowdown of the median time as a '
+                             'fraction of the baseline')
+    parser.add_argument('--no-render', action='store_true',
+                        help='skip the render benchmarks, which need PySide')
+    args = parser.parse_args(argv)
+    try:
+        args.sizes = [parse_size(s) for s in args.sizes.split(',')]
+    except ValueError:
+        parser.error('invalid --sizes %r' % args.sizes)
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    render = not args.no_render and (
+        args.only is None or
+        any(args.only in name for name in RENDER_BENCHMARKS))
+    try:
+        results = run(args.sizes, args.repeat, args.only, render)
+    except ImportError as e:
+        sys.stderr.write('The render benchmarks need PySide (%s), skip them '
+                         'with --no-render.\n' % e)
+        return 2
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump({'python': platform.python_version(),
+                       'machine': platform.machine(),
+                       'results': results}, f, indent=2, sort_keys=True)
+            f.write('\n')
+        return 0
+    if not os.path.exists(args.baseline):
+        print('\nNo baseline at %s, record one with --save-baseline.'
+              % args.baseline)
+        return 1
+    with open(args.baseline) as f:
+        baseline = json.load(f)['results']
+    print('\nCompared with %s:' % args.baseline)
+    for key in results:
+        if key in baseline:
+            print(format_result(key, results[key], baseline[key]))
+    regressions, missing = compare(results, baseline, args.tolerance)
+    status = 0
+    if missing:
+        print('\nNo baseline for %s, record one with --save-baseline.'
+              % ', '.join(missing))
+        status = 1
+    if regressions:
+        print('\n%d regression(s) beyond %d%%: %s' % (
+            len(regressions), 100 * args.tolerance, ', '.join(regressions)))
+        return 1
+    print('\nNo regressions beyond %d%%.' % (100 * args.tolerance))
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Command line capture and decode tool.
+
+Captures from the analyzer, or loads saved captures, runs an analyzer on each
+acquisition and streams the decoded labels to stdout as CSV or JSON lines.
+Neither Qt nor the ui package is imported, so it runs on headless machines.
+
+    python3 cli.py --analyzer USART test/usart_at_1MSps.csv
+    python3 cli.py --port auto --sample-count 50K --analyzer I2C --format json
+    python3 cli.py --batch --analyzer USART captures/
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+
+import acquire
+import analyzers
+import analyzers.batch
+import triggers
+from models import Acquisition, AnalyzerCommand
+
+TRIGGER_SLOPES = ['rising', 'falling']
+
+
+def parse_options(name, pairs):
+    """
+    Returns the keyword arguments for analyzer name from 'option=value'
+    strings.
+    """
+    options = dict((o.name, o) for o in analyzers.info(name).options)
+    kwargs = {}
+    for pair in pairs:
+        key, sep, text = pair.partition('=')
+        if not sep or key not in options:
+            raise ValueError('Invalid option %r, %s accepts: %s.' %
+                             (pair, name, ', '.join(options) or 'none'))
+        kwargs[key] = options[key].value(text)
+    return kwargs
+
+
+def parse_table_value(table, text):
+    """
+    Returns the value for text from one of the AnalyzerCommand tables, the
+    text may be a table key such as '50K' or a plain number.
+    """
+    if text in table:
+        return table[text]
+    return int(float(text))
+
+
+def file_acquisitions(paths):
+    """
+    Yields (source, Acquisition) for each capture file.
+    """
+    for path in paths:
+        yield path, Acquisition(path)
+
+
+def port_acquisitions(args):
+    """
+    Yields (source, Acquisition) for each capture read from the port.
+    """
+    command = AnalyzerCommand(
+        parse_table_value(AnalyzerCommand.sample_rates, args.sample_rate),
+        parse_table_value(AnalyzerCommand.sample_counts, args.sample_count),
+        trigger_type=TRIGGER_SLOPES.index(args.trigger_slope),
+        trigger_channel=args.trigger_channel)
+    engine = None
+    if args.software_trigger:
+        pre = command.sample_count // 2
+        engine = triggers.TriggerEngine(
+            triggers.parse_trigger(args.software_trigger,
+                                   command.sample_rate),
+            pre, command.sample_count - pre,
+            sample_rate=command.sample_rate)
+    port = acquire.open_port(None if args.port == 'auto' else args.port,
+                             args.baud)
+    reader = acquire.ContinuousReader(port, command)
+    count = 0
+    try:
+        for acquisition in reader.captures():
+            if engine is None:
+                captured = [acquisition]
+            else:
+                # Captures are not contiguous, each is a stream of its own.
+                engine.reset()
+                # A window left open at the end of the capture is kept
+                # with the samples there are.
+                captured = [c.acquisition
+                            for c in engine.feed(acquisition.samples) +
+                            engine.flush()]
+            for acquisition in captured:
+                yield '%s:%d' % (port.port, count), acquisition
+                count += 1
+                if args.count and count >= args.count:
+                    return
+    finally:
+        reader.stop()
+        port.close()
+
+
+class LabelWriter:
+    """
+    Writes decoded labels to a text stream as CSV rows or JSON lines.
+
+    Parameters
+    ----------
+    out : file
+        The text stream to write to.
+    output_format : str
+        'csv' or 'json'.
+    display : str
+        The byte display format, one of 'ascii', 'hex', 'decimal'.
+    """
+    fields = ['source', 'channel', 'sample', 'time', 'width', 'value']
+
+    def __init__(self, out, output_format='csv', display='hex'):
+        self.out = out
+        self.output_format = output_format
+        self.display = display
+        if output_format == 'csv':
+            self._csv = csv.writer(out, lineterminator='\n')
+            self._csv.writerow(self.fields)
+
+    def write(self, source, acquisition, channel_names, labels):
+        for channel, waveform_labels in zip(channel_names, labels):
+            rows = []
+            for x, width, value in waveform_labels:
+                text = analyzers.format_byte(value, self.display)
+                if self.output_format == 'csv':
+                    rows.append([source, channel, x, x * acquisition.dt,
+                                 width, text])
+                else:
+                    rows.append(json.dumps(
+                        {'source': source, 'channel': channel, 'sample': x,
+                         'time': x * acquisition.dt, 'width': width,
+                         'value': value, 'text': text}) + '\n')
+            if self.output_format == 'csv':
+                self._csv.writerows(rows)
+            else:
+                self.out.writelines(rows)
+        self.out.flush()
+
+
+def write_report(out, report, output_format='csv'):
+    """
+    Writes a batch report, see analyzers.batch.run_batch. CSV output has one
+    row per file followed by a row of totals, JSON output is the whole
+    report.
+    """
+    if output_format == 'json':
+        json.dump(report, out, indent=2)
+        out.write('\n')
+        return
+    writer = csv.writer(out, lineterminator='\n')
+    writer.writerow(['source', 'samples', 'frames', 'bytes', 'errors', 'baud',
+                     'baud_confidence', 'error'])
+    for summary in report['files']:
+        if summary['error'] is not None:
+            writer.writerow([summary['source'], '', '', '', '', '', '',
+                             summary['error']])
+            continue
+        channels = summary['channels'].values()
+        errors = [c['errors'] for c in channels if c['errors'] is not None]
+        writer.writerow([summary['source'], summary['samples'],
+                         sum(c['frames'] for c in channels),
+                         sum(c['bytes'] for c in channels),
+                         sum(errors) if errors else '',
+                         _optional(summary['baud']),
+                         _optional(summary['baud_confidence']), ''])
+    totals = report['totals']
+    writer.writerow(['total', totals['samples'], totals['frames'],
+                     totals['bytes'], _optional(totals['errors']), '',
+                     _optional(totals['min_baud_confidence']),
+                     '%d failed' % totals['failed'] if totals['failed']
+                     else ''])
+
+
+def _optional(value):
+    return '' if value is None else value
+
+
+def save_path(path, n):
+    """
+    Returns the path to save capture n to, numbered after the first.
+    """
+    if n == 0:
+        return path
+    root, ext = os.path.splitext(path)
+    return '%s_%d%s' % (root, n, ext)
+
+
+def analyzer_name(text):
+    """
+    Returns the registered spelling of an analyzer name given in any case.
+    """
+    try:
+        return analyzers.info(text).name
+    except ValueError:
+        return text
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Capture or load acquisitions and stream decoded '
+                    'labels to stdout.')
+    parser.add_argument('files', nargs='*',
+                        help='capture files (.lgc or .csv) to decode')
+    parser.add_argument('--port',
+                        help="serial port to capture from, 'auto' to use "
+                             "the first USB serial port")
+    parser.add_argument('--baud', type=int, default=115200,
+                        help='serial baud rate')
+    parser.add_argument('--sample-rate', default='1 MS/s',
+                        help="sample rate in Hz or a key such as '500 KS/s'")
+    parser.add_argument('--sample-count', default='50K',
+                        help="samples per capture, a number or a key such "
+                             "as '50K'")
+    parser.add_argument('--trigger-channel', type=int, default=0,
+                        choices=range(4), help='hardware trigger channel')
+    parser.add_argument('--trigger-slope', default='rising',
+                        choices=TRIGGER_SLOPES, help='hardware trigger slope')
+    parser.add_argument('--software-trigger', metavar='SPEC',
+                        help="host side trigger, e.g. 'usart 0x55 "
+                             "baud=9600', only matching windows are kept")
+    parser.add_argument('--count', type=int, default=1,
+                        help='number of captures to take, 0 to run until '
+                             'interrupted')
+    parser.add_argument('--save', metavar='PATH',
+                        help='also save port captures to PATH (.lgc), later '
+                             'captures are numbered')
+    parser.add_argument('-a', '--analyzer', choices=analyzers.names(),
+                        type=analyzer_name,
+                        help='analyzer to run, without one only a summary '
+                             'of each capture is written')
+    parser.add_argument('-o', '--option', action='append', default=[],
+                        metavar='NAME=VALUE',
+                        help='analyzer option, may be repeated')
+    parser.add_argument('--format', dest='output_format', default='csv',
+                        choices=['csv', 'json'], help='output format')
+    parser.add_argument('--display', default='hex',
+                        choices=['ascii', 'hex', 'decimal'],
+                        help='byte display format')
+    parser.add_argument('--batch', action='store_true',
+                        help='analyze the files, or the captures in '
+                             'directories, on a process pool and write only '
+                             'a report of byte counts, errors and bauds')
+    parser.add_argument('-j', '--jobs', type=int,
+                        help='worker processes for --batch, by default one '
+                             'per core')
+    args = parser.parse_args(argv)
+    if bool(args.files) == bool(args.port):
+        parser.error('give either capture files or --port')
+    if args.save and not args.port:
+        parser.error('--save only applies to --port captures')
+    if args.batch and (args.port or not args.analyzer):
+        parser.error('--batch needs capture files and an --analyzer')
+    try:
+        args.options = (parse_options(args.analyzer, args.option)
+                        if args.analyzer else {})
+    except ValueError as e:
+        parser.error(str(e))
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.batch:
+        report = analyzers.batch.run_batch(args.files, args.analyzer,
+                                           args.options, args.jobs)
+        try:
+            write_report(sys.stdout, report, args.output_format)
+        except BrokenPipeError:
+            sys.stderr.close()
+        return 1 if report['totals']['failed'] else 0
+    if args.port:
+        sources = port_acquisitions(args)
+    else:
+        sources = file_acquisitions(args.files)
+    if args.analyzer is not None:
+        writer = LabelWriter(sys.stdout, args.output_format, args.display)
+    try:
+        for n, (source, acquisition) in enumerate(sources):
+            if args.save:
+                acquisition.save_capture_file(save_path(args.save, n))
+            if args.analyzer is None:
+                summary = {'source': source,
+                           'samples': acquisition.acquisition_length,
+                           'sample_rate': acquisition.sample_rate,
+                           'channels': acquisition.channel_count}
+                sys.stdout.write(json.dumps(summary) + '\n')
+                continue
+            analyzer = analyzers.create(args.analyzer, acquisition,
+                                        **args.options)
+            writer.write(source, acquisition,
+                         analyzers.labels(args.analyzer), analyzer.labels())
+    except BrokenPipeError:
+        # The reader, such as head, exited early.
+        sys.stderr.close()
+        return 0
+    except (IOError, ValueError, TimeoutError) as e:
+        sys.stderr.write('%s: error: %s\n' % (os.path.basename(sys.argv[0]),
+                                              e))
+        return 1
+    except KeyboardInterrupt:
+        return 130
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -2,13 +2,18 @@
 
 import sys
 import os
+import threading
 import time
+from concurrent.futures import ProcessPoolExecutor
 
-import serial
-from serial.tools import list_ports
 from PySide import QtGui, QtCore
 
+import acquire
 import analyzers
+import analyzers.cache
+import analyzers.parallel
+import timing
+import triggers
 import ui
 from models import Acquisition, AnalyzerCommand, ThemeManager
 from ui.main_window import Ui_MainWindow
@@ -20,101 +25,182 @@ class AcquireThread(QtCore.QThread):
 
     Parameters
     ----------
-    com_desc : string
-        A description of the com port device. The com ports are
-        searched and the first port that has com_desc in its
-        description is connected to.
+    command : AnalyzerCommand
+        The acquisition command sent to the firmware.
 
     com_name : string
-        If com_desc is not given com_name can be given. This is
-        the path to the com port ('COM2', '/dev/tty0', etc)
+        The path to the com port ('COM2', '/dev/tty0', etc). If not given the
+        first USB serial port is used.
 
     baud : int
         The baud rate to connect with.
 
-    This object polls the serial port and emits an acquisiton when
-    it is received. It then kills the thread.
+    port : serial.Serial
+        An already open port to use instead of opening com_name.
+
+    continuous : bool
+        If True the port is kept open and captures are repeated until stop
+        is called.
+
+    triggerEngine : triggers.TriggerEngine
+        In continuous mode, only the windows around software triggers are
+        emitted. The engine is reset for every capture, so windows never span
+        two captures.
+
+    The acquisition is read in chunks. progress is emitted as data arrives
+    and, for single captures, partialData with the acquisition so far at most
+    every partialInterval seconds. dataReady is emitted with each complete
+    Acquisition. In continuous mode a capture that completes before the
+    previous one is acknowledged is dropped, so a slow display does not queue
+    up captures.
     """
 
     dataReady = QtCore.Signal(object)
+    partialData = QtCore.Signal(object)
+    progress = QtCore.Signal(int, int)
+    partialInterval = 0.1
 
-    def __init__(self, command, parent=None, com_name=None, baud=115200):
+    def __init__(self, command, parent=None, com_name=None, baud=115200,
+                 port=None, continuous=False, triggerEngine=None):
         super(AcquireThread, self).__init__()
-        self._running = False
-        self.serial = None
+        self.serial = port
         self.serialStatusOk = False
         self.baud = baud
         self.com_name = com_name
         self.command = command
-
-    def findSerialPort(self):
-        """
-        Returns a serial port string to connect to.
-        """
-        if self.com_name is None:
-            try:
-                com = ''
-                for item in list_ports.comports():
-                    if 'usb' in item[2]:
-                        return item[0]
-                if com == '':
-                    raise NameError('Could not find com port named %s.' %
-                                    item[0])
-            except:
-                self.serialStatusOk = False
-                self._running = False
-                return False
-        return self.com_name
+        self.continuous = continuous
+        self.triggerEngine = triggerEngine
+        self.reader = None
+        self.droppedCount = 0
+        self._stopRequested = False
+        self._lastPartial = 0
+        self._acknowledged = threading.Event()
+        self._acknowledged.set()
 
     def run(self):
         """
         Main serial thread run routine. First try to open serial port. If that
-        is successful then poll port and return lines of data as they are
-        received.
+        is successful then read acquisitions in chunks.
         """
         try:
-            self.serial = serial.Serial(self.findSerialPort(),
-                                        115200,
-                                        timeout=10)
-        except:
+            if self.serial is None:
+                self.serial = acquire.open_port(self.com_name, self.baud)
+        except (IOError, ValueError):
             self.serialStatusOk = False
-            self._running = False
-            return False
-
+            return
         self.serialStatusOk = True
-        self._running = True
-        serial_buffer = ''
-        self.serial.flushInput()
-        self.serial.flushOutput()
-
-        self.serial.write(self.command.command_bytes)
-
-        while self._running:
-            # Wait for data to arrive
-            start_time = time.time()
-            while self.serial.inWaiting() < 128:
-                if (time.time() - start_time) > 5:
-                    self.serialStatusOk = False
-                    self._running = False
-                    self.serial.close()
-                    return False
-            serial_buffer = self.serial.read(self.command.sample_count / 2)
-
-            self.dataReady.emit(serial_buffer)
-            self._running = False
+        if self.continuous:
+            self.reader = acquire.ContinuousReader(self.serial, self.command)
+        else:
+            self.reader = acquire.SerialReader(self.serial, self.command)
+        if self._stopRequested:
+            self.reader.stop()
+        try:
+            if self.continuous:
+                captures = self.reader.captures(self.onChunk)
+                while True:
+                    with timing.span('serial transfer'):
+                        acquisition = next(captures, None)
+                    if acquisition is None:
+                        break
+                    if self.triggerEngine is None:
+                        self.publish(acquisition)
+                        continue
+                    with timing.span('software trigger'):
+                        # Captures are not contiguous, each is a stream of
+                        # its own.
+                        self.triggerEngine.reset()
+                        # A window left open at the end of the capture is
+                        # kept with the samples there are.
+                        triggered = (self.triggerEngine.feed(
+                            acquisition.samples) + self.triggerEngine.flush())
+                    for capture in triggered:
+                        self.publish(capture.acquisition)
+            else:
+                with timing.span('serial transfer'):
+                    acquisition = self.reader.read(self.onChunk)
+                if acquisition is not None:
+                    self.dataReady.emit(acquisition)
+        except (IOError, TimeoutError):
+            self.serialStatusOk = False
+        finally:
             self.serial.close()
 
+    def publish(self, acquisition):
+        if self._acknowledged.is_set():
+            self._acknowledged.clear()
+            self.dataReady.emit(acquisition)
+        else:
+            self.droppedCount += 1
+
+    def acknowledge(self):
+        """
+        Called once a capture from dataReady has been displayed.
+        """
+        self._acknowledged.set()
+
+    def onChunk(self, received, total):
+        self.progress.emit(received, total)
+        if self.continuous:
+            return
+        now = time.monotonic()
+        if now - self._lastPartial >= self.partialInterval:
+            self._lastPartial = now
+            self.partialData.emit(self.reader.acquisition())
+
     def stop(self, wait=False):
         """
-        Stops the serial thread. If wait is True
-        this will wait until serial thread exits naturally,
-        preventing possible errors by a quick kill.
+        Stops the serial thread, the current read is abandoned within one
+        port timeout. If wait is True this waits until the thread exits.
         """
-        self._running = False
-        if self.serial is not None:
-            self.serial.close()
-            self.finished.emit()
-            self.exit()
+        self._stopRequested = True
+        if self.reader is not None:
+            self.reader.stop()
+        if wait:
+            self.wait()
+
+
+class AnalyzeThread(QtCore.QThread):
+    """
+    Runs an AnalysisJob so the GUI thread is not blocked while decoding.
+
+    Parameters
+    ----------
+    job : analyzers.parallel.AnalysisJob
+        The job to run.
+
+    labelsReady is emitted with the job and its labels when decoding
+    completes, it is not emitted if the job is cancelled.
+    """
+
+    labelsReady = QtCore.Signal(object, object)
+    showMessage = QtCore.Signal(str)
+
+    def __init__(self, job, parent=None):
+        super(AnalyzeThread, self).__init__(parent)
+        self.job = job
+
+    def run(self):
+        self.showMessage.emit('Decoding %s...' % self.job.name)
+        try:
+            with timing.span('labels', analyzer=self.job.name):
+                labels = self.job.run(self.reportProgress)
+        except Exception as e:
+            self.showMessage.emit('%s decoding failed: %s' % (self.job.name,
+                                                              e))
+            return
+        if labels is not None:
+            self.labelsReady.emit(self.job, labels)
+
+    def reportProgress(self, done, total):
+        self.showMessage.emit('Decoding %s... %d/%d' %
+                              (self.job.name, done, total))
+
+    def stop(self, wait=False):
+        """
+        Cancels the job. If wait is True this waits until the thread exits.
+        """
+        self.job.cancel()
         if wait:
             self.wait()
 
@@ -127,8 +213,18 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
         super(MainWindow, self).__init__(parent)
         self.app = parent_app
         self.acquireThread = None
-        self.currentAnalyzer = None
+        self.analyzerSettings = None
+        self.decodeCache = analyzers.cache.DecodeCache()
+        self.analyzeThread = None
+        # Superseded threads are kept referenced until they finish.
+        self.staleAnalyzeThreads = set()
+        self.executor = None
+        # Where to save the cProfile capture of the next acquisition.
+        self.profilePath = None
         self.setupUi(self)
+        self.actionRecord_Timings.setChecked(timing.timeline.enabled)
+        for name in analyzers.names():
+            self.protocolComboBox.addItem('%s...' % name)
         for key in AnalyzerCommand.sample_counts:
             self.sampleCountComboBox.addItem(key)
         for key in AnalyzerCommand.sample_rates:
@@ -166,54 +262,154 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
 
     @QtCore.Slot()
     def on_startButton_clicked(self):
-        self.startButton.setEnabled(False)
-        self.acquireThread = AcquireThread(
-            AnalyzerCommand(
-                AnalyzerCommand.sample_rates[
-                    self.sampleRateComboBox.currentText()],
-                AnalyzerCommand.sample_counts[
-                    self.sampleCountComboBox.currentText()],
-                trigger_type=self.triggerSlopeComboBox.currentIndex(),
-                trigger_channel=self.triggerChannelComboBox.currentIndex()))
+        if self.acquireThread is not None and self.acquireThread.isRunning():
+            # Only continuous acquisitions leave the button enabled.
+            self.acquireThread.stop()
+            self.startButton.setEnabled(False)
+            return
+        continuous = self.continuousCheckBox.isChecked()
+        command = AnalyzerCommand(
+            AnalyzerCommand.sample_rates[
+                self.sampleRateComboBox.currentText()],
+            AnalyzerCommand.sample_counts[
+                self.sampleCountComboBox.currentText()],
+            trigger_type=self.triggerSlopeComboBox.currentIndex(),
+            trigger_channel=self.triggerChannelComboBox.currentIndex())
+        triggerEngine = None
+        spec = self.softwareTriggerLineEdit.text().strip()
+        if continuous and spec:
+            try:
+                trigger = triggers.parse_trigger(spec, command.sample_rate)
+            except ValueError as e:
+                msg = QtGui.QMessageBox()
+                msg.setText('Invalid software trigger.\n\n%s' % e)
+                msg.exec_()
+                return
+            # Windows are at most one capture long, centered on the trigger
+            # where the capture allows.
+            pre = command.sample_count // 2
+            triggerEngine = triggers.TriggerEngine(
+                trigger, pre, command.sample_count - pre,
+                sample_rate=command.sample_rate)
+        # Partial captures are displayed without reloading the labels, so
+        # a decode of the previous data would label the new waveform.
+        self.stopAnalyzeThread()
+        self.beginCycle()
+        if continuous:
+            self.startButton.setText('Stop')
+        else:
+            self.startButton.setEnabled(False)
+        self.continuousCheckBox.setEnabled(False)
+        self.softwareTriggerLineEdit.setEnabled(False)
+        self.acquireThread = AcquireThread(command, continuous=continuous,
+                                           triggerEngine=triggerEngine)
         self.acquireThread.dataReady.connect(self.on_acquireThread_data,
                                              QtCore.Qt.QueuedConnection)
+        self.acquireThread.partialData.connect(
+            self.on_acquireThread_partialData, QtCore.Qt.QueuedConnection)
+        self.acquireThread.progress.connect(
+            self.on_acquireThread_progress, QtCore.Qt.QueuedConnection)
         self.acquireThread.finished.connect(self.on_acquireThread_finished,
                                             QtCore.Qt.QueuedConnection)
         self.acquireThread.start()
 
+    @QtCore.Slot(bool)
+    def on_continuousCheckBox_toggled(self, checked):
+        # Software triggers only apply to continuous acquisitions.
+        self.softwareTriggerLineEdit.setEnabled(checked)
+
     @QtCore.Slot()
     def on_actionOpen_triggered(self):
-        filename = QtGui.QFileDialog.getOpenFileName(self, 'Open',
-                                                     os.getcwd(),
-                                                     "CSV Files (*.csv)")[0]
+        filename = QtGui.QFileDialog.getOpenFileName(
+            self, 'Open', os.getcwd(),
+            "Captures (*.lgc *.csv);;Logician Captures (*.lgc);;"
+            "CSV Files (*.csv)")[0]
         if filename == '':
             return
+        self.beginCycle()
         try:
-            data = Acquisition(filename)
+            with timing.span('load file'):
+                data = Acquisition(filename)
         except Exception as e:
             msg = QtGui.QMessageBox()
             msg.setText('Error loading file.\n\n%s' % e)
             msg.exec_()
 
             return
-        self.setData(data, redraw=True)
+        with timing.span('setData'):
+            self.setData(data, redraw=True)
+        self.actionSave.setEnabled(True)
         self.actionSave_to_Spreadsheet.setEnabled(True)
+        self.finishCycle()
+
+    @QtCore.Slot()
+    def on_actionSave_triggered(self):
+        filename = QtGui.QFileDialog.getSaveFileName(
+            self, 'Save As', os.getcwd(), "Logician Captures (*.lgc)")[0]
+        if filename == '':
+            return
+        if not filename.endswith('.lgc'):
+            filename += '.lgc'
+        data = self.analyzerWidget.data
+        data.channel_names = list(self.analyzerWidget.waveformLabels)
+        try:
+            data.save_capture_file(filename)
+        except IOError:
+            msg = QtGui.QMessageBox()
+            msg.setText('There was an error saving the file.')
+            msg.exec_()
 
     @QtCore.Slot()
     def on_actionSave_to_Spreadsheet_triggered(self):
-        filename = QtGui.QFileDialog.getSaveFileName(self, 'Save As',
-                                                     os.getcwd(),
-                                                     "CSV Files (*.csv)")[0]
+        changesFilter = "CSV Change Points (*.csv)"
+        filename, selectedFilter = QtGui.QFileDialog.getSaveFileName(
+            self, 'Save As', os.getcwd(),
+            "CSV Files (*.csv);;%s" % changesFilter)
+        if filename == '':
+            return
+        try:
+            self.analyzerWidget.data.save_csv_file(
+                filename, changes_only=selectedFilter == changesFilter)
+        except IOError:
+            msg = QtGui.QMessageBox()
+            msg.setText('There was an error saving the file.')
+            msg.exec_()
+
+    @QtCore.Slot(bool)
+    def on_actionRecord_Timings_toggled(self, checked):
+        timing.timeline.enabled = checked
+        if checked:
+            timing.timeline.clear()
+        else:
+            self.statusBar.clearMessage()
+
+    @QtCore.Slot()
+    def on_actionSave_Timings_triggered(self):
+        if not timing.timeline.events:
+            self.statusBar.showMessage(
+                'No timings recorded, enable View > Record Timings.', 5000)
+            return
+        filename = QtGui.QFileDialog.getSaveFileName(
+            self, 'Save Timings', os.getcwd(), "Chrome Trace (*.json)")[0]
         if filename == '':
             return
         try:
-            with open(filename, 'w') as f:
-                f.write(self.analyzerWidget.data.csv_string())
+            timing.timeline.save(filename)
         except IOError:
             msg = QtGui.QMessageBox()
             msg.setText('There was an error saving the file.')
             msg.exec_()
 
+    @QtCore.Slot()
+    def on_actionProfile_Next_Capture_triggered(self):
+        filename = QtGui.QFileDialog.getSaveFileName(
+            self, 'Save Profile', os.getcwd(), "Profiles (*.prof)")[0]
+        if filename == '':
+            return
+        self.profilePath = filename
+        self.statusBar.showMessage(
+            'The next capture or opened file will be profiled.', 5000)
+
     @QtCore.Slot()
     def on_protocolComboBox_activated(self):
         if self.protocolComboBox.currentIndex() != 0:
@@ -221,10 +417,20 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
             dialog.protocolComboBox.setCurrentIndex(
                 self.protocolComboBox.currentIndex() - 1)
             if dialog.exec_() == 1:
-                self.currentAnalyzer = self.setAnalyzerFromDialog(dialog)
+                try:
+                    self.setAnalyzerFromDialog(dialog)
+                except ValueError as e:
+                    msg = QtGui.QMessageBox()
+                    msg.setText('Invalid analyzer options.\n\n%s' % e)
+                    msg.exec_()
+                    return
                 self.protocolComboBox.setCurrentIndex(
                     dialog.protocolComboBox.currentIndex() + 1)
-            self.reloadByteLabels()
+        else:
+            self.analyzerSettings = None
+            self.analyzerWidget.setWaveformLabels(analyzers.labels(''))
+            self.analyzerWidget.setByteLabels([], redraw=True)
+        self.reloadByteLabels()
 
     @QtCore.Slot()
     def on_displayModeComboBox_currentIndexChanged(self):
@@ -239,32 +445,120 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
             if a != action:
                 a.setChecked(False)
 
-    def on_acquireThread_data(self, data_bytes):
-        self.setData(
-            Acquisition(data_bytes, sample_rate=1e6, channel_count=4))
+    def on_acquireThread_data(self, acquisition):
+        with timing.span('setData'):
+            self.setData(acquisition, redraw=True)
+        self.actionSave.setEnabled(True)
         self.actionSave_to_Spreadsheet.setEnabled(True)
+        self.statusBar.clearMessage()
+        self.acquireThread.acknowledge()
+        self.finishCycle()
+
+    def on_acquireThread_partialData(self, acquisition):
+        # Labels are only decoded once the acquisition is complete.
+        self.analyzerWidget.setData(acquisition, redraw=True)
+
+    def on_acquireThread_progress(self, received, total):
+        self.statusBar.showMessage('Receiving... %d%%' %
+                                   (100 * received // max(total, 1)))
 
     def on_acquireThread_finished(self):
+        self.startButton.setText('Start')
         self.startButton.setEnabled(True)
+        self.continuousCheckBox.setEnabled(True)
+        self.softwareTriggerLineEdit.setEnabled(
+            self.continuousCheckBox.isChecked())
+        if not self.acquireThread.serialStatusOk:
+            self.statusBar.showMessage('Acquisition failed.', 5000)
 
     def setData(self, data, redraw=False):
         self.analyzerWidget.setData(data, redraw)
         self.reloadByteLabels()
 
+    def beginCycle(self):
+        """
+        Called when an acquisition is started or a file is opened, starts
+        the requested profile and resets the timing summary.
+        """
+        timing.timeline.begin_cycle()
+        if self.profilePath is not None and not timing.timeline.profiling:
+            timing.timeline.start_profile()
+
+    def finishCycle(self, decoded=False):
+        """
+        Called when data, or with decoded True its labels, have been
+        displayed. Shows the timing summary and, once no decode is pending,
+        saves the profile.
+        """
+        if timing.timeline.enabled:
+            self.statusBar.showMessage(timing.timeline.summary())
+        pending = not decoded and self.analyzeThread is not None
+        if not timing.timeline.profiling or pending:
+            return
+        path, self.profilePath = self.profilePath, None
+        if timing.timeline.stop_profile(path):
+            self.statusBar.showMessage('Profile saved to %s' % path, 5000)
+
     def setAnalyzerFromDialog(self, dialog):
-        data = self.analyzerWidget.data
-        if 'USART' in dialog.protocolComboBox.currentText():
-            analyzer = analyzers.USARTAnalyzer(data)
-        elif 'I2C' in dialog.protocolComboBox.currentText():
-            analyzer = analyzers.I2CAnalyzer(data)
-        elif 'SPI' in dialog.protocolComboBox.currentText():
-            analyzer = analyzers.SPIAnalyzer(data)
-        return analyzer
+        """
+        Stores the analyzer name and options selected in dialog, the analyzer
+        is created for the current data when labels are reloaded.
+        """
+        self.analyzerSettings = (dialog.analyzerName(), dialog.options())
+        self.analyzerWidget.setWaveformLabels(
+            analyzers.labels(dialog.analyzerName()))
 
     def reloadByteLabels(self):
-        if self.currentAnalyzer is not None:
-            self.analyzerWidget.setByteLabels(self.currentAnalyzer.labels(),
-                                              redraw=True)
+        """
+        Decodes the current data with the selected analyzer in the
+        background, cancelling any decode still in progress.
+        """
+        self.stopAnalyzeThread()
+        if self.analyzerSettings is None:
+            return
+        name, options = self.analyzerSettings
+        data = self.analyzerWidget.data
+        with timing.span('reloadByteLabels', analyzer=name):
+            labels = self.decodeCache.get(name, data, options)
+            if labels is not None:
+                self.analyzerWidget.setByteLabels(labels, redraw=True)
+                return
+        if timing.timeline.profiling:
+            # Decode on the analyze thread so the profile includes it.
+            executor = None
+        else:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor()
+            executor = self.executor
+        job = analyzers.parallel.AnalysisJob(executor, name, data, options)
+        self.analyzeThread = AnalyzeThread(job)
+        self.analyzeThread.labelsReady.connect(self.on_analyzeThread_labels,
+                                               QtCore.Qt.QueuedConnection)
+        self.analyzeThread.showMessage.connect(self.statusBar.showMessage,
+                                               QtCore.Qt.QueuedConnection)
+        self.analyzeThread.start()
+
+    def stopAnalyzeThread(self, wait=False):
+        if self.analyzeThread is None:
+            return
+        thread = self.analyzeThread
+        self.analyzeThread = None
+        thread.labelsReady.disconnect(self.on_analyzeThread_labels)
+        thread.stop(wait)
+        if not thread.isFinished():
+            self.staleAnalyzeThreads.add(thread)
+            thread.finished.connect(
+                lambda: self.staleAnalyzeThreads.discard(thread))
+
+    def on_analyzeThread_labels(self, job, labels):
+        if self.analyzeThread is None or job is not self.analyzeThread.job:
+            return
+        with timing.span('setByteLabels'):
+            labels = self.decodeCache.put(job.name, job.acquisition,
+                                          job.options, labels)
+            self.analyzerWidget.setByteLabels(labels, redraw=True)
+        self.statusBar.showMessage('Decoded %s' % job.name, 2000)
+        self.finishCycle(decoded=True)
 
     def loadSettings(self):
         try:
@@ -295,6 +589,16 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
         closed.
         """
         self.saveSettings()
+        if self.acquireThread is not None:
+            self.acquireThread.stop(wait=True)
+        self.stopAnalyzeThread(wait=True)
+        for thread in list(self.staleAnalyzeThreads):
+            thread.wait()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+        path = timing.trace_path()
+        if path is not None and timing.timeline.events:
+            timing.timeline.save(path)
         event.accept()
 
 if __name__ == '__main__':
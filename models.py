@@ -1,18 +1,252 @@
 """
 This file contains the general data storage classes used throughout Logician.
 """
-import csv
+import hashlib
+import io
 import json
+import mmap
 import os
+import re
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
 from collections import OrderedDict
+from itertools import compress
+from operator import ne
 
 VALID_CHANNEL_COUNTS = [4]
 
+# Run length encoded acquisitions are expanded this many samples at a time.
+_CHUNK_SAMPLES = 1 << 20
+
+# Binary capture files start with a fixed header: magic, format version,
+# header size, sample rate, sample count, channel count, bits per sample,
+# trigger type and trigger channel. It is followed by one length prefixed
+# UTF-8 name per channel, then the samples at header size.
+CAPTURE_MAGIC = b'LGCN'
+CAPTURE_VERSION = 2
+_CAPTURE_HEADER = struct.Struct('<4sHHdQBBBB')
+_NO_TRIGGER = 0xFF
+
+# Version 2 adds run length encoded files, marked by 0 bits per sample. Each
+# channel is stored as its initial value and edge count followed by the edge
+# positions as little endian 64 bit ints.
+_RUN_LENGTH = 0
+_RUN_LENGTH_CHANNEL = struct.Struct('<BQ')
+
+
+class Channel:
+    """
+    A read only view of a single channel of an Acquisition.
+
+    Indexing with an int returns the 0 or 1 value of that sample, indexing
+    with a slice returns a bytes object of 0's and 1's.
+
+    Parameters
+    ----------
+    samples : bytes
+        The packed samples of the acquisition, one byte per sample with
+        channel n stored in bit n.
+    index : int
+        The channel number this view represents.
+    """
+    def __init__(self, samples, index):
+        self._samples = samples
+        self.index = index
+        self._edges = None
+
+    def bits(self):
+        """
+        Returns the whole channel as a bytes object of 0's and 1's.
+        """
+        return self._samples.translate(_CHANNEL_TABLES[self.index])
+
+    def edges(self):
+        """
+        Returns the sorted positions of every transition in the channel.
+
+        An edge at position i means sample i differs from sample i - 1. The
+        index is computed on first use and cached.
+
+        Returns
+        -------
+        array
+            The edge positions as an array of ints.
+        """
+        if self._edges is None:
+            bits = self.bits()
+            n = len(bits)
+            # Matching runs is fastest for sparse signals, dense signals such
+            # as clocks are faster to difference with a big int XOR.
+            if 20 * bits.count(b'\x00\x01') <= n:
+                runs = _RUN_PATTERN.finditer(bits)
+                next(runs, None)
+                self._edges = array('l', [m.start() for m in runs])
+            else:
+                changed = (int.from_bytes(bits[:-1], 'big') ^
+                           int.from_bytes(bits[1:], 'big')).to_bytes(n - 1,
+                                                                     'big')
+                self._edges = array('l', compress(range(1, n), changed))
+        return self._edges
+
+    def falling_edges(self):
+        """
+        Returns the positions of the edges where the channel goes from 1 to
+        0.
+        """
+        edges = self.edges()
+        if len(edges) == 0:
+            return edges
+        return edges[0::2] if self[0] == 1 else edges[1::2]
+
+    def rising_edges(self):
+        """
+        Returns the positions of the edges where the channel goes from 0 to
+        1.
+        """
+        edges = self.edges()
+        if len(edges) == 0:
+            return edges
+        return edges[1::2] if self[0] == 1 else edges[0::2]
+
+    def next_edge(self, i):
+        """
+        Returns the position of the first edge after i, or None if there is
+        no later edge.
+        """
+        edges = self.edges()
+        n = bisect_right(edges, i)
+        return edges[n] if n < len(edges) else None
+
+    def previous_edge(self, i):
+        """
+        Returns the position of the last edge at or before i, that is the
+        start of the run containing i, or None if there is no such edge.
+        """
+        edges = self.edges()
+        n = bisect_right(edges, i)
+        return edges[n - 1] if n > 0 else None
+
+    def run_at(self, i):
+        """
+        Returns the run of constant value containing sample i.
+
+        Returns
+        -------
+        tuple
+            (start, stop, value), where stop is one past the last sample of
+            the run.
+        """
+        edges = self.edges()
+        n = bisect_right(edges, i)
+        start = edges[n - 1] if n > 0 else 0
+        stop = edges[n] if n < len(edges) else len(self)
+        return start, stop, self[i]
+
+    def pulse_widths(self):
+        """
+        Returns the widths of every complete pulse in the channel.
+
+        The runs before the first and after the last edge are truncated by
+        the acquisition and are not included.
+        """
+        edges = self.edges()
+        return array('l', [b - a for a, b in zip(edges, edges[1:])])
+
+    def values_at(self, positions):
+        """
+        Returns the values of the samples at positions as a bytes object of
+        0's and 1's.
+        """
+        return bytes(map(self.bits().__getitem__, positions))
+
+    def __len__(self):
+        return len(self._samples)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self._samples[key].translate(_CHANNEL_TABLES[self.index])
+        return (self._samples[key] >> self.index) & 1
+
+    def __iter__(self):
+        return iter(self.bits())
+
+
+class RunLengthChannel(Channel):
+    """
+    A channel stored as the positions of its edges rather than its samples.
+
+    Samples are only expanded on demand, so long captures of slow signals
+    take little memory. Edge queries work directly on the stored positions.
+
+    Parameters
+    ----------
+    edges : iterable of int
+        The sorted positions where the value changes, see Channel.edges.
+    initial : int
+        The value, 0 or 1, of the first sample.
+    length : int
+        The number of samples.
+    index : int
+        The channel number this view represents.
+    """
+    def __init__(self, edges, initial, length, index):
+        self._edges = array('l', edges)
+        self.initial = initial
+        self._length = length
+        self.index = index
+
+    def bits(self):
+        return self.expand(0, self._length)
+
+    def expand(self, start, stop):
+        """
+        Returns samples start to stop as a bytes object of 0's and 1's.
+        """
+        edges = self._edges
+        n = bisect_right(edges, start)
+        bounds = [start]
+        bounds.extend(edges[n:bisect_left(edges, stop, n)])
+        bounds.append(stop)
+        value = (self.initial + n) & 1
+        return b''.join(_RUN_BYTES[(value + k) & 1] * (b - a)
+                        for k, (a, b) in enumerate(zip(bounds, bounds[1:])))
+
+    def edges(self):
+        return self._edges
+
+    def values_at(self, positions):
+        edges = self._edges
+        initial = self.initial
+        return bytes([(initial + bisect_right(edges, p)) & 1
+                      for p in positions])
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self._length)
+            if step == 1:
+                return self.expand(start, max(start, stop))
+            return self.bits()[key]
+        if key < 0:
+            key += self._length
+        if not 0 <= key < self._length:
+            raise IndexError('sample index out of range')
+        return (self.initial + bisect_right(self._edges, key)) & 1
+
 
 class Acquisition:
     """
     The acqusition object contains data from all of the acquired channels.
 
+    Samples are stored packed, one byte per sample with channel n held in bit
+    n, and each channel is exposed through a Channel view. Alternatively an
+    acquisition created with from_edges stores only the edges of each channel
+    in RunLengthChannel views.
+
     Parameters
     ----------
     data : array or bytes or str
@@ -22,8 +256,21 @@ class Acquisition:
 
     samplerate : int
         The acquisition rate in Samples / sec.
+
+    trigger_type, trigger_channel : int
+        The trigger settings used for the acquisition, if any.
+
+    channel_names : List of str
+        Names of the channels, saved with binary capture files.
+
+    If data is a str it is the path of a capture file, either a binary capture
+    written by save_capture_file or a CSV file.
     """
-    def __init__(self, data, sample_rate=1, channel_count=None):
+    def __init__(self, data, sample_rate=1, channel_count=None,
+                 trigger_type=None, trigger_channel=None, channel_names=None):
+        self.trigger_type = trigger_type
+        self.trigger_channel = trigger_channel
+        self.channel_names = channel_names
         if isinstance(data, list):
             if len(data) not in VALID_CHANNEL_COUNTS:
                 raise ValueError('data must have length %s'
@@ -32,55 +279,511 @@ class Acquisition:
             for channel in data:
                 if len(channel) != l:
                     raise ValueError('All channels must be have same length.')
-            self.data = data
+            self._set_samples(_pack_channels(data), len(data))
         elif isinstance(data, bytes):
             if channel_count not in VALID_CHANNEL_COUNTS:
                 raise ValueError('Invalid number of channels.')
-            # Convert byte string to list of 1's and 0's. If there are 4
-            # channels each byte should have 2 4 channel samples in it. The MSB
-            # is the 4th channel of the least recent sample.
-            sep_channel_data = [f(c) for c in data
-                                for f in (lambda x: ord(x) >> 4,
-                                          lambda x: ord(x) & 0x0F)]
-            unpacked_data = [[int(i) for i in list(bin(d)[2:].zfill(4))]
-                             for d in sep_channel_data]
-            self.data = list(zip(*unpacked_data))
-            self.data.reverse()
+            self._set_samples(unpack_samples(data), channel_count)
         elif isinstance(data, str):
-            self.load_csv_file(data)
+            if is_capture_file(data):
+                self.load_capture_file(data)
+            else:
+                self.load_csv_file(data)
             return
         else:
             raise TypeError('Invalid data type')
         self.sample_rate = sample_rate
 
+    @classmethod
+    def from_samples(cls, samples, channel_count, sample_rate=1, **kwargs):
+        """
+        Returns an acquisition of already unpacked samples, one byte per
+        sample with channel n in bit n.
+
+        Other keyword arguments are as for Acquisition.
+        """
+        if channel_count not in VALID_CHANNEL_COUNTS:
+            raise ValueError('Invalid number of channels.')
+        acquisition = cls.__new__(cls)
+        acquisition.trigger_type = kwargs.get('trigger_type')
+        acquisition.trigger_channel = kwargs.get('trigger_channel')
+        acquisition.channel_names = kwargs.get('channel_names')
+        acquisition._set_samples(bytes(samples), channel_count)
+        acquisition.sample_rate = sample_rate
+        return acquisition
+
+    @classmethod
+    def from_edges(cls, edges, initial_values, length, sample_rate=1,
+                   **kwargs):
+        """
+        Returns a run length encoded acquisition.
+
+        Parameters
+        ----------
+        edges : List of array
+            The edge positions of each channel, see Channel.edges.
+        initial_values : List of int
+            The value of the first sample of each channel.
+        length : int
+            The number of samples.
+
+        Other keyword arguments are as for Acquisition.
+        """
+        if len(edges) not in VALID_CHANNEL_COUNTS:
+            raise ValueError('Invalid number of channels.')
+        acquisition = cls.__new__(cls)
+        acquisition.trigger_type = kwargs.get('trigger_type')
+        acquisition.trigger_channel = kwargs.get('trigger_channel')
+        acquisition.channel_names = kwargs.get('channel_names')
+        acquisition._set_runs(edges, initial_values, length)
+        acquisition.sample_rate = sample_rate
+        return acquisition
+
+    def run_length_encoded(self):
+        """
+        Returns a copy of the acquisition stored as the edges of each
+        channel.
+
+        Examples
+        --------
+        >>> import os, tempfile
+        >>> acquisition = Acquisition([[0, 1, 1, 0, 1], [1, 1, 1, 1, 1],
+        ...                            [0, 0, 0, 1, 1], [1, 0, 1, 0, 1]], 1000)
+        >>> encoded = acquisition.run_length_encoded()
+        >>> encoded.run_length, encoded[0].initial, list(encoded[0].edges())
+        (True, 0, [1, 3, 4])
+        >>> encoded.samples == acquisition.samples
+        True
+
+        The edges are saved to and loaded from capture files as they are:
+
+        >>> directory = tempfile.TemporaryDirectory()
+        >>> fname = os.path.join(directory.name, 'edges.lgc')
+        >>> encoded.save_capture_file(fname)
+        >>> loaded = Acquisition(fname)
+        >>> loaded.run_length, loaded.samples == acquisition.samples
+        (True, True)
+        >>> Acquisition([[], [], [], []]).run_length_encoded(
+        ...     ).save_capture_file(fname)
+        >>> loaded = Acquisition(fname)
+        >>> loaded.run_length, loaded.acquisition_length, loaded.samples
+        (True, 0, b'')
+        >>> directory.cleanup()
+        """
+        if self.run_length:
+            return self
+        return Acquisition.from_edges(
+            [c.edges() for c in self.data], [c[0] if len(c) else 0
+                                             for c in self.data],
+            self.acquisition_length, self.sample_rate,
+            trigger_type=self.trigger_type,
+            trigger_channel=self.trigger_channel,
+            channel_names=self.channel_names)
+
+    def expanded(self):
+        """
+        Returns a copy of the acquisition stored as packed samples.
+        """
+        if not self.run_length:
+            return self
+        acquisition = Acquisition.__new__(Acquisition)
+        acquisition.__setstate__(dict(self.__getstate__(),
+                                      samples=self.samples))
+        return acquisition
+
+    def _set_samples(self, samples, channel_count):
+        self._samples = samples
+        self._length = len(samples)
+        self.data = [Channel(samples, n) for n in range(channel_count)]
+        self._fingerprint = None
+
+    def _set_runs(self, edges, initial_values, length):
+        self._samples = None
+        self._length = length
+        self.data = [RunLengthChannel(e, v, length, n)
+                     for n, (e, v) in enumerate(zip(edges, initial_values))]
+        self._fingerprint = None
+
+    @property
+    def run_length(self):
+        """
+        True if the acquisition is stored as edges rather than samples.
+        """
+        return self._samples is None
+
+    @property
+    def samples(self):
+        """
+        The packed samples, one byte per sample with channel n in bit n.
+
+        Run length encoded acquisitions are expanded on each access, use
+        iter_chunks to process them with bounded memory.
+        """
+        if self._samples is None:
+            return b''.join(self.iter_chunks())
+        return self._samples
+
+    def iter_chunks(self, chunk_size=_CHUNK_SAMPLES):
+        """
+        Yields the packed samples in consecutive chunks of at most
+        chunk_size samples.
+        """
+        for start in range(0, self._length, chunk_size):
+            stop = min(start + chunk_size, self._length)
+            if self._samples is not None:
+                yield self._samples[start:stop]
+            else:
+                packed = 0
+                for channel in self.data:
+                    packed |= int.from_bytes(channel.expand(start, stop),
+                                             'big') << channel.index
+                yield packed.to_bytes(stop - start, 'big')
+
+    @property
+    def fingerprint(self):
+        """
+        A digest of the samples and sample rate, identifying the acquisition
+        contents for caching.
+        """
+        if self._fingerprint is None:
+            h = hashlib.blake2b(digest_size=16)
+            h.update(repr((self.sample_rate, self.channel_count,
+                           self._length, self.run_length)).encode())
+            if self.run_length:
+                for channel in self.data:
+                    h.update(bytes([channel.initial]))
+                    h.update(channel.edges().tobytes())
+            else:
+                h.update(self._samples)
+            self._fingerprint = h.hexdigest()
+        return self._fingerprint
+
+    def __getstate__(self):
+        # Channel caches are rebuilt on demand, only the samples or edges are
+        # pickled when an acquisition is sent to another process.
+        state = {'sample_rate': self.sample_rate,
+                 'channel_count': self.channel_count,
+                 'length': self._length,
+                 'trigger_type': self.trigger_type,
+                 'trigger_channel': self.trigger_channel,
+                 'channel_names': self.channel_names}
+        if self.run_length:
+            state['edges'] = [c.edges() for c in self.data]
+            state['initial_values'] = [c.initial for c in self.data]
+        else:
+            state['samples'] = self._samples
+        return state
+
+    def __setstate__(self, state):
+        if 'samples' in state:
+            self._set_samples(state['samples'], state['channel_count'])
+        else:
+            self._set_runs(state['edges'], state['initial_values'],
+                           state['length'])
+        self.sample_rate = state['sample_rate']
+        self.trigger_type = state.get('trigger_type')
+        self.trigger_channel = state.get('trigger_channel')
+        self.channel_names = state.get('channel_names')
+
     @property
     def dt(self):
         return 1.0 / self.sample_rate
 
     @property
     def acquisition_length(self):
-        return len(self.data[0])
+        return self._length
 
     @property
     def channel_count(self):
         return len(self.data)
 
-    def csv_string(self):
-        out_string = '#sample_rate=%d' % self.sample_rate
-        for row in zip(*self.data):
-            out_string += str(row)[1:-1].replace(' ', '')
-            out_string += '\n'
-        return out_string
+    def csv_string(self, changes_only=False):
+        """
+        Returns the acquisition as a CSV string, see write_csv.
+        """
+        out = io.BytesIO()
+        self.write_csv(out, changes_only)
+        return out.getvalue().decode('ascii')
+
+    def save_csv_file(self, fname, changes_only=False):
+        """
+        Writes the acquisition to the CSV file fname, see write_csv.
+        """
+        with open(fname, 'wb') as f:
+            self.write_csv(f, changes_only)
+
+    def write_csv(self, f, changes_only=False):
+        """
+        Writes the acquisition as CSV to the binary file object f.
+
+        The file starts with a '#sample_rate=' header followed by one row of
+        channel values per sample. Rows are written in chunks, so memory use
+        does not grow with the acquisition length.
+
+        Parameters
+        ----------
+        f : file
+            A file object opened in binary mode.
+        changes_only : bool
+            If True only the samples where any channel changes are written,
+            each row prefixed with its sample index, and a '#length=' header
+            gives the total number of samples.
+
+        Examples
+        --------
+        >>> import os, tempfile
+        >>> acquisition = Acquisition([[0, 0, 1, 1, 1, 0], [0] * 6, [1] * 6,
+        ...                            [0, 0, 0, 0, 1, 1]], 1000)
+        >>> print(acquisition.csv_string(changes_only=True), end='')
+        #sample_rate=1000
+        #length=6
+        0,0,0,1,0
+        2,1,0,1,0
+        4,1,0,1,1
+        5,0,0,1,1
+
+        Such a file loads run length encoded:
+
+        >>> directory = tempfile.TemporaryDirectory()
+        >>> fname = os.path.join(directory.name, 'changes.csv')
+        >>> acquisition.save_csv_file(fname, changes_only=True)
+        >>> loaded = Acquisition(fname)
+        >>> loaded.run_length, loaded.samples == acquisition.samples
+        (True, True)
+        >>> directory.cleanup()
+        """
+        rows = _csv_rows(self.channel_count)
+        f.write(b'#sample_rate=%d\n' % self.sample_rate)
+        if not changes_only:
+            for chunk in self.iter_chunks(_CSV_CHUNK_ROWS):
+                f.write(b''.join(map(rows.__getitem__, chunk)))
+            return
+        f.write(b'#length=%d\n' % self.acquisition_length)
+        offset = 0
+        previous = None
+        for chunk in self.iter_chunks(_CSV_CHUNK_ROWS):
+            out = []
+            for m in _SAMPLE_RUN_PATTERN.finditer(chunk):
+                value = chunk[m.start()]
+                # A run may continue from the previous chunk.
+                if value != previous:
+                    out.append(b'%d,%s' % (offset + m.start(), rows[value]))
+                    previous = value
+            f.write(b''.join(out))
+            offset += len(chunk)
 
     def load_csv_file(self, fname):
-        with open(fname) as f:
-            reader = csv.reader(f)
-            header = next(reader)
-            sample_rate = int(header[0].split('=')[-1])
-            data = [[int(d) for d in row] for row in reader
-                    if len(row) != 1]
-        self.data = list(zip(*data))
+        """
+        Loads a CSV file written by write_csv.
+
+        The file is parsed in chunks of whole rows, each chunk is converted to
+        packed samples with bytes operations rather than per cell.
+
+        Raises
+        ------
+        ValueError
+            If the header is missing, there are no rows, or the rows do not
+            hold 1 to 8 channels of 0's and 1's.
+        """
+        with open(fname, 'rb') as f:
+            header = {}
+            line = f.readline()
+            while line.startswith(b'#'):
+                for field in line[1:].split(b','):
+                    key, _, value = field.strip().partition(b'=')
+                    header[key.decode('ascii')] = value.decode('ascii')
+                line = f.readline()
+            if 'sample_rate' not in header:
+                raise ValueError('CSV file is missing the #sample_rate '
+                                 'header.')
+            sample_rate = int(float(header['sample_rate']))
+            while line and not line.strip():
+                line = f.readline()
+            if not line:
+                raise ValueError('CSV file has no samples.')
+            channel_count = line.count(b',') + 1
+            if 'length' in header:
+                channel_count -= 1
+            # Each sample is packed into a single byte.
+            if not 1 <= channel_count <= 8:
+                raise ValueError('CSV files must have 1 to 8 channels, '
+                                 'found %d.' % channel_count)
+            samples = bytearray()
+            changes = array('l')
+            chunk = line
+            while chunk:
+                chunk += f.read(_CSV_CHUNK_SIZE)
+                chunk += f.readline()
+                if 'length' in header:
+                    changes += _parse_csv_changes(chunk, channel_count)
+                else:
+                    samples += _parse_csv_rows(chunk, channel_count)
+                chunk = f.readline()
+        if 'length' in header:
+            # Change points are already run length encoded.
+            self._set_runs(*_csv_changes_to_edges(changes, channel_count,
+                                                  int(header['length'])))
+        else:
+            self._set_samples(bytes(samples), channel_count)
+        self.sample_rate = sample_rate
+
+    def save_capture_file(self, fname):
+        """
+        Writes the acquisition to fname in the binary capture format.
+
+        With up to 4 channels two samples are packed per byte in the same
+        nibble order as the firmware stream, otherwise one byte is written
+        per sample. Run length encoded acquisitions are written as the edges
+        of each channel.
+        """
+        if self.run_length:
+            bits_per_sample = _RUN_LENGTH
+        else:
+            bits_per_sample = 4 if self.channel_count <= 4 else 8
+        names = self.channel_names or ['Ch %d' % n
+                                       for n in range(self.channel_count)]
+        names = [name.encode('utf-8')[:255] for name in names]
+        names = b''.join(bytes([len(name)]) + name for name in names)
+        header_size = _CAPTURE_HEADER.size + len(names)
+        header = _CAPTURE_HEADER.pack(
+            CAPTURE_MAGIC, 2 if self.run_length else 1, header_size,
+            self.sample_rate,
+            self.acquisition_length, self.channel_count, bits_per_sample,
+            _NO_TRIGGER if self.trigger_type is None else self.trigger_type,
+            _NO_TRIGGER if self.trigger_channel is None
+            else self.trigger_channel)
+        with open(fname, 'wb') as f:
+            f.write(header)
+            f.write(names)
+            if bits_per_sample == _RUN_LENGTH:
+                for channel in self.data:
+                    edges = channel.edges()
+                    f.write(_RUN_LENGTH_CHANNEL.pack(channel.initial,
+                                                     len(edges)))
+                    f.write(_edges_to_bytes(edges))
+            elif bits_per_sample == 4:
+                f.write(pack_samples(self.samples))
+            else:
+                f.write(self.samples)
+
+    def load_capture_file(self, fname):
+        """
+        Loads a binary capture file written by save_capture_file.
+
+        The file is memory mapped, so only the header and the sample data are
+        read. The packed data is copied out of the mapping once, then
+        unpacked.
+
+        Raises
+        ------
+        ValueError
+            If the file is not a valid capture file or is truncated.
+
+        Examples
+        --------
+        An odd number of samples pads the last byte of a 4 channel file:
+
+        >>> import os, tempfile
+        >>> acquisition = Acquisition(
+        ...     [[0, 1, 0], [1, 1, 0], [0, 0, 1], [1, 0, 1]], 500000,
+        ...     trigger_type=1, trigger_channel=2,
+        ...     channel_names=['RX', 'TX', 'Ch 2', 'Ch 3'])
+        >>> directory = tempfile.TemporaryDirectory()
+        >>> fname = os.path.join(directory.name, 'capture.lgc')
+        >>> acquisition.save_capture_file(fname)
+        >>> loaded = Acquisition(fname)
+        >>> loaded.samples == acquisition.samples, loaded.sample_rate
+        (True, 500000)
+        >>> loaded.channel_names, loaded.trigger_type, loaded.trigger_channel
+        (['RX', 'TX', 'Ch 2', 'Ch 3'], 1, 2)
+
+        Truncated or corrupt files raise ValueError:
+
+        >>> with open(fname, 'rb') as f:
+        ...     data = f.read()
+        >>> def load(data):
+        ...     with open(fname, 'wb') as f:
+        ...         f.write(data)
+        ...     try:
+        ...         Acquisition(fname)
+        ...     except ValueError as e:
+        ...         print(e)
+        >>> load(data[:10])
+        File is too short to be a capture file.
+        >>> load(data[:-1])
+        Capture file is truncated.
+        >>> names = _CAPTURE_HEADER.size
+        >>> load(data[:names] + bytes([255]) + data[names + 1:])
+        Invalid channel names.
+        >>> directory.cleanup()
+        """
+        with open(fname, 'rb') as f, \
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            if len(m) < _CAPTURE_HEADER.size:
+                raise ValueError('File is too short to be a capture file.')
+            (magic, version, header_size, sample_rate, sample_count,
+             channel_count, bits_per_sample, trigger_type,
+             trigger_channel) = _CAPTURE_HEADER.unpack_from(m)
+            if magic != CAPTURE_MAGIC:
+                raise ValueError('Not a capture file.')
+            if version > CAPTURE_VERSION:
+                raise ValueError('Unsupported capture file version %d.'
+                                 % version)
+            if channel_count not in VALID_CHANNEL_COUNTS:
+                raise ValueError('Invalid number of channels.')
+            if not _CAPTURE_HEADER.size <= header_size <= len(m):
+                raise ValueError('Capture file is truncated.')
+            names = []
+            pos = _CAPTURE_HEADER.size
+            for n in range(channel_count):
+                if pos >= header_size or pos + 1 + m[pos] > header_size:
+                    raise ValueError('Invalid channel names.')
+                length = m[pos]
+                names.append(m[pos + 1:pos + 1 + length].decode('utf-8'))
+                pos += 1 + length
+            if bits_per_sample == _RUN_LENGTH:
+                edges = []
+                initial_values = []
+                pos = header_size
+                for n in range(channel_count):
+                    if len(m) < pos + _RUN_LENGTH_CHANNEL.size:
+                        raise ValueError('Capture file is truncated.')
+                    initial, count = _RUN_LENGTH_CHANNEL.unpack_from(m, pos)
+                    pos += _RUN_LENGTH_CHANNEL.size
+                    if len(m) < pos + 8 * count:
+                        raise ValueError('Capture file is truncated.')
+                    edges.append(_edges_from_bytes(m[pos:pos + 8 * count]))
+                    initial_values.append(initial)
+                    pos += 8 * count
+                data_size = 0
+            elif bits_per_sample == 4:
+                data_size = (sample_count + 1) // 2
+            elif bits_per_sample == 8:
+                data_size = sample_count
+            else:
+                raise ValueError('Invalid bits per sample %d.'
+                                 % bits_per_sample)
+            if len(m) < header_size + data_size:
+                raise ValueError('Capture file is truncated.')
+            data = m[header_size:header_size + data_size]
+        if bits_per_sample == _RUN_LENGTH:
+            self._set_runs(edges, initial_values, sample_count)
+        elif bits_per_sample == 4:
+            samples = unpack_samples(data)
+            if len(samples) != sample_count:
+                # The last byte is padded when the sample count is odd.
+                samples = samples[:sample_count]
+            self._set_samples(samples, channel_count)
+        else:
+            self._set_samples(data, channel_count)
         self.sample_rate = sample_rate
+        if sample_rate == int(sample_rate):
+            self.sample_rate = int(sample_rate)
+        self.trigger_type = (None if trigger_type == _NO_TRIGGER
+                             else trigger_type)
+        self.trigger_channel = (None if trigger_channel == _NO_TRIGGER
+                                else trigger_channel)
+        self.channel_names = names
 
     def __len__(self):
         return len(self.data)
@@ -92,6 +795,215 @@ class Acquisition:
         return iter(self.data)
 
 
+def unpack_samples(data):
+    """
+    Converts the packed firmware byte stream into one byte per sample.
+
+    If there are 4 channels each byte holds 2 4 channel samples. The MSB is
+    the 4th channel of the least recent sample, so after unpacking channel n
+    of each sample is stored in bit n.
+
+    Parameters
+    ----------
+    data : bytes
+        The raw bytes received from the firmware.
+
+    Returns
+    -------
+    bytes
+        The unpacked samples, twice the length of data.
+
+    Examples
+    --------
+    >>> list(unpack_samples(bytes([0x81, 0x3C])))
+    [8, 1, 3, 12]
+    >>> [list(c) for c in Acquisition(bytes([0x81]), channel_count=4)]
+    [[0, 1], [0, 0], [0, 0], [1, 0]]
+    """
+    samples = bytearray(2 * len(data))
+    samples[0::2] = data.translate(_HIGH_NIBBLE_TABLE)
+    samples[1::2] = data.translate(_LOW_NIBBLE_TABLE)
+    return bytes(samples)
+
+
+def pack_samples(samples):
+    """
+    Packs samples of up to 4 channels two per byte, the inverse of
+    unpack_samples. An odd number of samples is padded with a zero sample.
+
+    Examples
+    --------
+    >>> list(pack_samples(bytes([8, 1, 3, 12])))
+    [129, 60]
+    >>> unpack_samples(pack_samples(bytes([1, 2, 3]))) == bytes([1, 2, 3, 0])
+    True
+    """
+    if len(samples) % 2:
+        samples = samples + b'\x00'
+    if not samples:
+        return b''
+    high = int.from_bytes(samples[0::2].translate(_SHIFT_NIBBLE_TABLE), 'big')
+    low = int.from_bytes(samples[1::2], 'big')
+    return (high | low).to_bytes(len(samples) // 2, 'big')
+
+
+def _csv_rows(channel_count):
+    """
+    Returns a list of the CSV row for each possible packed sample value.
+    """
+    return [(','.join(str((i >> n) & 1) for n in range(channel_count)) +
+             '\n').encode('ascii') for i in range(256)]
+
+
+def _parse_csv_rows(chunk, channel_count):
+    """
+    Converts complete CSV rows of 0's and 1's to packed samples.
+    """
+    separators = b',' * (channel_count - 1) + b'\n'
+    row_size = 2 * channel_count
+    if not chunk.endswith(b'\n'):
+        chunk += b'\n'
+    if (len(chunk) % row_size or
+            chunk[1::2] != separators * (len(chunk) // row_size)):
+        # Not in the canonical form, drop whitespace and blank lines and try
+        # again.
+        lines = chunk.translate(None, b' \t\r').split(b'\n')
+        chunk = b''.join(line + b'\n' for line in lines if line)
+        if (len(chunk) % row_size or
+                chunk[1::2] != separators * (len(chunk) // row_size)):
+            raise ValueError('Every CSV row must have %d values.'
+                             % channel_count)
+    digits = chunk[0::2]
+    if digits.translate(None, b'01'):
+        raise ValueError('CSV values must be 0 or 1.')
+    packed = 0
+    for n in range(channel_count):
+        packed |= int.from_bytes(
+            digits[n::channel_count].translate(_ASCII_CHANNEL_TABLES[n]),
+            'big')
+    return packed.to_bytes(len(digits) // channel_count, 'big')
+
+
+def _parse_csv_changes(chunk, channel_count):
+    """
+    Converts CSV rows of a sample index followed by channel values to an
+    array of alternating sample indices and packed sample values.
+    """
+    changes = array('l')
+    for line in chunk.split(b'\n'):
+        values = line.translate(None, b' \t\r').split(b',')
+        if values == [b'']:
+            continue
+        if len(values) != channel_count + 1:
+            raise ValueError('Every CSV row must have %d values.'
+                             % (channel_count + 1))
+        changes.append(int(values[0]))
+        changes.append(_pack_row(values[1:]))
+    return changes
+
+
+def _csv_changes_to_edges(changes, channel_count, length):
+    """
+    Converts the output of _parse_csv_changes to the edges and initial value
+    of each channel.
+    """
+    positions = changes[0::2]
+    values = changes[1::2]
+    if length and (not positions or positions[0] != 0):
+        raise ValueError('The first CSV row must be sample 0.')
+    stops = positions[1:] + array('l', [length])
+    if any(a >= b for a, b in zip(positions, stops)):
+        raise ValueError('CSV sample indices must be increasing and less '
+                         'than the length.')
+    edges = []
+    initial_values = []
+    for n in range(channel_count):
+        bits = [(v >> n) & 1 for v in values]
+        initial_values.append(bits[0] if bits else 0)
+        edges.append(array('l', compress(positions[1:],
+                                         map(ne, bits, bits[1:]))))
+    return edges, initial_values, length
+
+
+def _pack_row(values):
+    sample = 0
+    for n, value in enumerate(values):
+        if value not in (b'0', b'1'):
+            raise ValueError('CSV values must be 0 or 1.')
+        sample |= (value == b'1') << n
+    return sample
+
+
+def _edges_to_bytes(edges):
+    """
+    Returns edge positions as little endian 64 bit ints.
+    """
+    edges = array('q', edges)
+    if sys.byteorder == 'big':
+        edges.byteswap()
+    return edges.tobytes()
+
+
+def _edges_from_bytes(data):
+    """
+    Returns an array of the edge positions written by _edges_to_bytes.
+    """
+    edges = array('q')
+    edges.frombytes(data)
+    if sys.byteorder == 'big':
+        edges.byteswap()
+    return array('l', edges)
+
+
+def is_capture_file(fname):
+    """
+    Returns True if fname starts with the binary capture file magic.
+    """
+    with open(fname, 'rb') as f:
+        return f.read(len(CAPTURE_MAGIC)) == CAPTURE_MAGIC
+
+
+def _pack_channels(channels):
+    """
+    Packs a list of channels of 0's and 1's into bytes with one byte per
+    sample, channel n being stored in bit n.
+    """
+    length = len(channels[0])
+    packed = 0
+    for n, channel in enumerate(channels):
+        channel = bytes(channel)
+        if channel.translate(None, b'\x00\x01'):
+            raise ValueError('Channel data must only contain 0 or 1.')
+        packed |= int.from_bytes(channel, 'big') << n
+    return packed.to_bytes(length, 'big')
+
+
+# Matches each run of constant value in a channel of 0's and 1's.
+_RUN_PATTERN = re.compile(b'\x00+|\x01+')
+
+# Single sample values, repeated to expand runs.
+_RUN_BYTES = (b'\x00', b'\x01')
+
+# Translation tables extracting a single channel from packed samples.
+_CHANNEL_TABLES = [bytes((i >> n) & 1 for i in range(256)) for n in range(8)]
+
+# Translation tables splitting firmware bytes into their two samples.
+_HIGH_NIBBLE_TABLE = bytes(i >> 4 for i in range(256))
+_LOW_NIBBLE_TABLE = bytes(i & 0x0F for i in range(256))
+_SHIFT_NIBBLE_TABLE = bytes((i << 4) & 0xF0 for i in range(256))
+
+# Translation tables mapping ASCII '0' and '1' to the bit of channel n.
+_ASCII_CHANNEL_TABLES = [bytes((i == 49) << n for i in range(256))
+                         for n in range(8)]
+
+# Runs of identical samples, the start of each is a change point.
+_SAMPLE_RUN_PATTERN = re.compile(b'(.)\\1*', re.DOTALL)
+
+# CSV files are read and written this many bytes or rows at a time.
+_CSV_CHUNK_SIZE = 1 << 20
+_CSV_CHUNK_ROWS = 1 << 16
+
+
 class AnalyzerCommand:
     """
     Simple class to hold analyzer commands and create appropriate command bytes
@@ -112,14 +1024,16 @@ class AnalyzerCommand:
         sp = int(1.0 / sample_rate / 1e-6)
         self.sample_count = sample_count
         self.sample_rate = sample_rate
-        sample_count /= 1000
+        self.trigger_type = trigger_type
+        self.trigger_channel = trigger_channel
+        sample_count //= 1000
         self.command_bytes = \
             [0x01,                              # Command
              (sp & 0x00FF), (sp >> 8),          # Sample Period (us)
              (sample_count & 0x00FF), (sample_count >> 8),
              trigger_type, trigger_channel]
-        self.command_bytes = (''.join([chr(x) for x in self.command_bytes]) +
-                              ' '*(64 - len(self.command_bytes)))
+        self.command_bytes = (bytes(self.command_bytes) +
+                              b' '*(64 - len(self.command_bytes)))
 
 
 class ThemeManager:
@@ -0,0 +1,212 @@
+"""
+Timing spans for the acquire to display pipeline.
+
+Stages wrap their work in span(name). While the timeline is enabled each span
+is recorded as a Chrome trace event, which can be saved and opened in
+chrome://tracing or Perfetto, and the latest duration of every stage is kept
+for a one line summary. While disabled a span does no work.
+
+Timing is enabled at startup by setting the LOGICIAN_TIMING environment
+variable, a value ending in .json is also the path the trace is saved to on
+exit.
+
+A cProfile capture covering the spans of every thread can be taken with
+start_profile and stop_profile.
+"""
+import functools
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager, nullcontext
+
+ENV_VAR = 'LOGICIAN_TIMING'
+_NO_SPAN = nullcontext()
+
+
+class Timeline:
+    """
+    Records timing spans from any thread.
+
+    Parameters
+    ----------
+    enabled : bool
+        If False spans are not recorded.
+    max_events : int
+        The number of events kept, older events are discarded so continuous
+        acquisitions do not grow the trace without bound.
+    """
+    def __init__(self, enabled=False, max_events=100000):
+        self.enabled = enabled
+        self.events = deque(maxlen=max_events)
+        self.latest = OrderedDict()
+        self._origin = time.perf_counter()
+        self._threads = {}
+        self._profiles = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def span(self, name, **args):
+        """
+        Returns a context manager timing the enclosed block as the stage
+        name, args are stored with the trace event.
+        """
+        if not self.enabled and self._profiles is None:
+            return _NO_SPAN
+        return self._span(name, args)
+
+    @contextmanager
+    def _span(self, name, args):
+        profile = self._enter_profile()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self._exit_profile(profile)
+            if self.enabled:
+                self.add(name, start, end, **args)
+
+    def add(self, name, start, end, **args):
+        """
+        Records a span of stage name between two time.perf_counter values.
+        """
+        thread = threading.current_thread()
+        event = {'name': name, 'ph': 'X', 'pid': os.getpid(),
+                 'tid': thread.ident,
+                 'ts': 1e6 * (start - self._origin),
+                 'dur': 1e6 * (end - start)}
+        if args:
+            event['args'] = args
+        with self._lock:
+            self._threads[thread.ident] = thread.name
+            self.events.append(event)
+            self.latest[name] = end - start
+
+    def begin_cycle(self):
+        """
+        Forgets the latest durations, called when a new acquisition or file
+        starts so the summary only holds its stages.
+        """
+        with self._lock:
+            self.latest.clear()
+
+    def summary(self):
+        """
+        Returns the latest duration of each stage, in the order the stages
+        were first recorded, for example
+        'serial transfer 120.3 ms  redraw 8.1 ms'.
+        """
+        with self._lock:
+            items = list(self.latest.items())
+        return '  '.join('%s %.1f ms' % (name, 1e3 * duration)
+                         for name, duration in items)
+
+    def clear(self):
+        with self._lock:
+            self.events.clear()
+            self.latest.clear()
+
+    def save(self, fname):
+        """
+        Saves the recorded spans as a Chrome trace JSON file.
+        """
+        with self._lock:
+            events = list(self.events)
+            threads = dict(self._threads)
+        pid = os.getpid()
+        metadata = [{'name': 'thread_name', 'ph': 'M', 'pid': pid,
+                     'tid': tid, 'args': {'name': name}}
+                    for tid, name in threads.items()]
+        with open(fname, 'w') as f:
+            json.dump({'traceEvents': metadata + events,
+                       'displayTimeUnit': 'ms'}, f)
+
+    @property
+    def profiling(self):
+        return self._profiles is not None
+
+    def start_profile(self):
+        """
+        Starts a cProfile capture, from now on the outermost span on each
+        thread is profiled.
+        """
+        with self._lock:
+            self._profiles = []
+
+    def stop_profile(self, fname):
+        """
+        Stops the cProfile capture and saves the combined statistics of every
+        profiled span to fname, they can be read with pstats or snakeviz.
+
+        Returns
+        -------
+        bool
+            False if no span ran during the capture and nothing was saved.
+        """
+        with self._lock:
+            profiles, self._profiles = self._profiles or [], None
+        if not profiles:
+            return False
+        import pstats
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            stats.add(profile)
+        stats.dump_stats(fname)
+        return True
+
+    def _enter_profile(self):
+        depth = getattr(self._local, 'depth', 0)
+        self._local.depth = depth + 1
+        if depth or self._profiles is None:
+            return None
+        # Imported on first use, cProfile and pstats slow down startup.
+        import cProfile
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler is already active.
+            return None
+        with self._lock:
+            if self._profiles is None:
+                profile.disable()
+                return None
+            self._profiles.append(profile)
+        return profile
+
+    def _exit_profile(self, profile):
+        self._local.depth -= 1
+        if profile is not None:
+            profile.disable()
+
+
+def _env_enabled():
+    return os.environ.get(ENV_VAR, '') not in ('', '0')
+
+
+def trace_path():
+    """
+    Returns the path given in the environment to save the trace to on exit,
+    or None.
+    """
+    value = os.environ.get(ENV_VAR, '')
+    return value if value.lower().endswith('.json') else None
+
+
+timeline = Timeline(_env_enabled())
+span = timeline.span
+
+
+def timed(name):
+    """
+    Decorates a function so every call is recorded as a span of stage name.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timeline.span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,445 @@
+"""
+Host side triggers evaluated over a stream of packed samples.
+
+A trigger is fed consecutive chunks of samples, one byte per sample with
+channel n in bit n, and returns the absolute positions where it fires. The
+TriggerEngine keeps a ring buffer of pre-trigger history and returns only the
+windows of samples around each trigger. reset starts a new stream, for samples
+that do not follow on from the previous chunk.
+"""
+import re
+from collections import namedtuple
+
+from models import Acquisition, Channel
+
+# A window of samples around a trigger. position is the absolute sample index
+# of the trigger in the stream and offset its index in the acquisition.
+TriggeredCapture = namedtuple('TriggeredCapture',
+                              ['position', 'offset', 'acquisition'])
+
+_MATCH_START = re.compile(b'\x00\x01')
+
+
+class PatternTrigger:
+    """
+    Fires when the channels change to match a pattern.
+
+    Parameters
+    ----------
+    pattern : str
+        One character per channel, starting with channel 0: '1' or '0' for a
+        required level, 'x' for don't care.
+
+    The trigger fires on the first sample of each run of matching samples. A
+    pattern that already matches when the stream starts does not fire until
+    it stops matching and matches again.
+    """
+    def __init__(self, pattern):
+        mask = 0
+        value = 0
+        for n, c in enumerate(pattern):
+            if c in '01':
+                mask |= 1 << n
+                value |= int(c) << n
+            elif c not in 'xX':
+                raise ValueError('Pattern characters must be 0, 1 or x.')
+        self.pattern = pattern
+        self._table = bytes((i & mask) == value for i in range(256))
+        self.reset()
+
+    def reset(self):
+        self._previous = b'\x01'
+        self.offset = 0
+
+    def positions(self, chunk):
+        matches = self._previous + chunk.translate(self._table)
+        positions = [self.offset + m.start()
+                     for m in _MATCH_START.finditer(matches)]
+        self._previous = matches[-1:]
+        self.offset += len(chunk)
+        return positions
+
+
+class PulseWidthTrigger:
+    """
+    Fires on pulses whose width violates a limit.
+
+    Parameters
+    ----------
+    channel : int
+        The channel to watch.
+    min_width : int
+        Pulses shorter than this many samples fire at their trailing edge.
+    max_width : int
+        Pulses longer than this many samples fire as soon as they exceed it.
+    level : int
+        1 to check high pulses, 0 to check low pulses.
+    """
+    def __init__(self, channel, min_width=None, max_width=None, level=1):
+        if min_width is None and max_width is None:
+            raise ValueError('A minimum or maximum width is required.')
+        self.channel = channel
+        self.min_width = min_width
+        self.max_width = max_width
+        self.level = level
+        self.reset()
+
+    def reset(self):
+        self.offset = 0
+        self._value = None
+        # The start of the current run, None until the first edge as the run
+        # the stream starts in is incomplete.
+        self._run_start = None
+        self._fired = False
+
+    def positions(self, chunk):
+        if not len(chunk):
+            return []
+        channel = Channel(chunk, self.channel)
+        edges = [self.offset + e for e in channel.edges()]
+        if self._value is None:
+            self._value = channel[0]
+        elif channel[0] != self._value:
+            edges.insert(0, self.offset)
+        positions = []
+        for edge in edges:
+            # The run at level self._value ends at edge.
+            self._check_long(edge, positions)
+            if (self.min_width is not None and self._value == self.level and
+                    self._run_start is not None and
+                    edge - self._run_start < self.min_width):
+                positions.append(edge)
+            self._run_start = edge
+            self._fired = False
+            self._value ^= 1
+        self.offset += len(chunk)
+        self._check_long(self.offset, positions)
+        return positions
+
+    def _check_long(self, stop, positions):
+        # Fires once per run, when the current run is known to be longer
+        # than max_width by stop.
+        if (self.max_width is not None and self._value == self.level and
+                self._run_start is not None and not self._fired and
+                stop - self._run_start > self.max_width):
+            positions.append(self._run_start + self.max_width)
+            self._fired = True
+
+
+class USARTTrigger:
+    """
+    Fires when a USART frame with a given value is received.
+
+    Parameters
+    ----------
+    value : int
+        The data value to match.
+    bit_size : float
+        The length of one bit in samples.
+    bit_count : int
+        The number of data bits per frame.
+    channel : int
+        The channel carrying the USART signal.
+
+    The trigger position is the end of the matched data bits, or the start of
+    the chunk that completed the frame if that is later.
+    """
+    def __init__(self, value, bit_size, bit_count=8, channel=0):
+        # Imported here so the analyzers are only loaded when needed.
+        from analyzers.usart import USARTDecoder
+        self.value = value
+        self.decoder = USARTDecoder(bit_size, bit_count, channel)
+        self.offset = 0
+
+    def reset(self):
+        self.decoder.reset()
+        self.offset = 0
+
+    def positions(self, chunk):
+        labels = self.decoder.feed(chunk)
+        positions = [max(int(x + width), self.offset)
+                     for x, width, value in labels if value == self.value]
+        self.offset += len(chunk)
+        return positions
+
+
+class RingBuffer:
+    """
+    A fixed size buffer holding the most recent size bytes written to it.
+
+    Examples
+    --------
+    >>> history = RingBuffer(4)
+    >>> history.extend(b'abc')
+    >>> history.get()
+    b'abc'
+    >>> history.extend(b'de')
+    >>> history.get(), len(history)
+    (b'bcde', 4)
+    >>> history.extend(b'fgh')
+    >>> history.get()
+    b'efgh'
+    >>> history.extend(b'ijklmn')
+    >>> history.get()
+    b'klmn'
+    """
+    def __init__(self, size):
+        self.size = size
+        self._buffer = bytearray(size)
+        self.clear()
+
+    def clear(self):
+        self._head = 0
+        self._count = 0
+
+    def extend(self, data):
+        n = len(data)
+        if n >= self.size:
+            self._buffer[:] = data[n - self.size:]
+            self._head = 0
+            self._count = self.size
+            return
+        first = min(n, self.size - self._head)
+        self._buffer[self._head:self._head + first] = data[:first]
+        self._buffer[:n - first] = data[first:]
+        self._head = (self._head + n) % self.size
+        self._count = min(self._count + n, self.size)
+
+    def get(self):
+        """
+        Returns the buffered bytes, oldest first.
+        """
+        if self._count < self.size:
+            return bytes(self._buffer[:self._count])
+        return bytes(self._buffer[self._head:] + self._buffer[:self._head])
+
+    def __len__(self):
+        return self._count
+
+
+class TriggerEngine:
+    """
+    Runs a trigger over a stream of samples and keeps the windows around
+    each trigger.
+
+    Parameters
+    ----------
+    trigger : PatternTrigger, PulseWidthTrigger or USARTTrigger
+        The trigger to evaluate.
+    pre_samples : int
+        The number of samples before the trigger kept in each window.
+    post_samples : int
+        The number of samples from the trigger on kept in each window.
+    channel_count : int
+        The number of channels in the stream.
+    sample_rate : int
+        The sample rate of the stream.
+
+    Triggers that fire while a window is being filled are ignored, the
+    engine rearms once the window is complete. When the stream ends, flush
+    returns the window still being filled.
+
+    Examples
+    --------
+    Channel 0 rises at samples 5, 8 and 32, the rise at 8 falls inside the
+    first window:
+
+    >>> samples = bytes([0] * 5 + [1, 0, 0, 1] + [0] * 23 + [1, 1] + [0] * 6)
+    >>> def windows(chunk_size):
+    ...     engine = TriggerEngine(PatternTrigger('1'), 4, 8)
+    ...     return [(c.position, c.offset, bytes(c.acquisition.samples))
+    ...             for i in range(0, len(samples), chunk_size)
+    ...             for c in engine.feed(samples[i:i + chunk_size])]
+    >>> for position, offset, window in windows(len(samples)):
+    ...     print(position, offset, list(window))
+    5 4 [0, 0, 0, 0, 1, 0, 0, 1, 0, 0, 0, 0]
+    32 4 [0, 0, 0, 0, 1, 1, 0, 0, 0, 0, 0, 0]
+
+    Windows that span chunk boundaries are the same however the stream is
+    split:
+
+    >>> all(windows(size) == windows(len(samples))
+    ...     for size in range(1, len(samples)))
+    True
+
+    Separate captures are fed after a reset, a trigger too late in a capture
+    to fill its window is returned by flush with the samples there are:
+
+    >>> engine = TriggerEngine(PatternTrigger('1'), 4, 8)
+    >>> capture = bytes([0] * 10 + [1] + [0] * 3)
+    >>> for _ in range(2):
+    ...     engine.reset()
+    ...     for c in engine.feed(capture) + engine.flush():
+    ...         print(c.position, c.offset, list(c.acquisition.samples))
+    10 4 [0, 0, 0, 0, 1, 0, 0, 0]
+    10 4 [0, 0, 0, 0, 1, 0, 0, 0]
+    """
+    def __init__(self, trigger, pre_samples, post_samples, channel_count=4,
+                 sample_rate=1):
+        self.trigger = trigger
+        self.pre_samples = pre_samples
+        self.post_samples = post_samples
+        self.channel_count = channel_count
+        self.sample_rate = sample_rate
+        self.history = RingBuffer(pre_samples)
+        self.offset = 0
+        self._window = None
+
+    def reset(self):
+        """
+        Starts a new stream, the history, the trigger state and any window
+        still being filled are discarded and positions count from 0 again.
+
+        Call this before each chunk that does not follow on from the
+        previous one, such as separate hardware captures, so no window
+        joins samples from both sides of the gap. Call flush first to keep
+        the window being filled.
+        """
+        self.trigger.reset()
+        self.history.clear()
+        self.offset = 0
+        self._window = None
+
+    def feed(self, chunk):
+        """
+        Processes the next chunk of samples.
+
+        Returns
+        -------
+        List of TriggeredCapture
+            The windows completed by this chunk.
+        """
+        captures = []
+        positions = iter(self.trigger.positions(chunk))
+        start = self.offset
+        end = start + len(chunk)
+        cursor = start
+        while cursor < end or (self._window is not None and
+                               cursor == self._window_end):
+            if self._window is not None:
+                take = min(self._window_end, end) - cursor
+                data = chunk[cursor - start:cursor - start + take]
+                self._window += data
+                self.history.extend(data)
+                cursor += take
+                if cursor == self._window_end:
+                    captures.append(self._finish_window())
+                continue
+            position = next((p for p in positions if p >= cursor), None)
+            if position is None:
+                self.history.extend(chunk[cursor - start:])
+                break
+            self.history.extend(chunk[cursor - start:position - start])
+            cursor = position
+            self._window = bytearray(self.history.get())
+            self._window_offset = len(self._window)
+            self._window_position = position
+            self._window_end = position + self.post_samples
+        self.offset = end
+        return captures
+
+    def flush(self):
+        """
+        Ends the window still being filled, for when no more samples follow.
+
+        Returns
+        -------
+        List of TriggeredCapture
+            The partly filled window, shorter than pre_samples plus
+            post_samples, or an empty list if no window was being filled.
+        """
+        if self._window is None:
+            return []
+        return [self._finish_window()]
+
+    def _finish_window(self):
+        acquisition = Acquisition.from_samples(
+            self._window, self.channel_count, self.sample_rate)
+        capture = TriggeredCapture(self._window_position,
+                                   self._window_offset, acquisition)
+        self._window = None
+        return capture
+
+
+def parse_trigger(spec, sample_rate=1, channel_count=4):
+    """
+    Creates a trigger from a text description.
+
+    Parameters
+    ----------
+    spec : str
+        One of:
+        'pattern 1x0x',
+        'width channel=0 min=5 max=100 level=1', widths in samples,
+        'usart 0x55 baud=9600 channel=0 bits=8'.
+    sample_rate : int
+        The sample rate, used to convert a USART baud rate to a bit size.
+    channel_count : int
+        The number of channels in the stream, the channels a trigger uses
+        must be among them.
+
+    Raises
+    ------
+    ValueError
+        If spec is not a valid trigger.
+
+    Examples
+    --------
+    >>> parse_trigger('pattern 1x0x').pattern
+    '1x0x'
+    >>> parse_trigger('usart 0x55 baud=9600', 1000000).value
+    85
+    >>> parse_trigger('usart 0x55 baud=0', 1000000)
+    Traceback (most recent call last):
+        ...
+    ValueError: The USART baud rate must be positive.
+    >>> parse_trigger('width channel=9 min=3')
+    Traceback (most recent call last):
+        ...
+    ValueError: Trigger channels must be 0 to 3.
+    >>> parse_trigger('pattern 1x0x1')
+    Traceback (most recent call last):
+        ...
+    ValueError: Trigger patterns can have at most 4 channels.
+    """
+    tokens = spec.split()
+    if not tokens:
+        raise ValueError('Empty trigger.')
+    kind = tokens[0].lower()
+    args = [t for t in tokens[1:] if '=' not in t]
+    options = dict(t.split('=', 1) for t in tokens[1:] if '=' in t)
+    try:
+        if kind == 'pattern' and len(args) == 1 and not options:
+            if len(args[0]) > channel_count:
+                raise ValueError('Trigger patterns can have at most %d '
+                                 'channels.' % channel_count)
+            return PatternTrigger(args[0])
+        if kind == 'width' and not args:
+            return PulseWidthTrigger(
+                _channel(options.pop('channel', 0), channel_count),
+                _optional_int(options.pop('min', None)),
+                _optional_int(options.pop('max', None)),
+                int(options.pop('level', 1)), **options)
+        if kind == 'usart' and len(args) == 1:
+            baud = int(options.pop('baud', 115200))
+            if baud <= 0:
+                raise ValueError('The USART baud rate must be positive.')
+            return USARTTrigger(int(args[0], 0), float(sample_rate) / baud,
+                                int(options.pop('bits', 8)),
+                                _channel(options.pop('channel', 0),
+                                         channel_count), **options)
+    except TypeError:
+        raise ValueError('Unknown trigger option in %r.' % spec)
+    raise ValueError('Invalid trigger %r.' % spec)
+
+
+def _optional_int(text):
+    return None if text is None else int(text)
+
+
+def _channel(text, channel_count):
+    channel = int(text)
+    if not 0 <= channel < channel_count:
+        raise ValueError('Trigger channels must be 0 to %d.'
+                         % (channel_count - 1))
+    return channel
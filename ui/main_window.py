@@ -61,6 +61,13 @@ class Ui_MainWindow(object):
         self.triggerSlopeComboBox.addItem("")
         self.triggerSlopeComboBox.addItem("")
         self.topRowLayout.addWidget(self.triggerSlopeComboBox)
+        self.continuousCheckBox = QtGui.QCheckBox(self.topRowLayoutWidget)
+        self.continuousCheckBox.setObjectName("continuousCheckBox")
+        self.topRowLayout.addWidget(self.continuousCheckBox)
+        self.softwareTriggerLineEdit = QtGui.QLineEdit(self.topRowLayoutWidget)
+        self.softwareTriggerLineEdit.setEnabled(False)
+        self.softwareTriggerLineEdit.setObjectName("softwareTriggerLineEdit")
+        self.topRowLayout.addWidget(self.softwareTriggerLineEdit)
         self.startButton = QtGui.QPushButton(self.topRowLayoutWidget)
         self.startButton.setObjectName("startButton")
         self.topRowLayout.addWidget(self.startButton)
@@ -90,9 +97,6 @@ class Ui_MainWindow(object):
         self.protocolComboBox.setSizePolicy(sizePolicy)
         self.protocolComboBox.setObjectName("protocolComboBox")
         self.protocolComboBox.addItem("")
-        self.protocolComboBox.addItem("")
-        self.protocolComboBox.addItem("")
-        self.protocolComboBox.addItem("")
         self.verticalLayout.addWidget(self.protocolComboBox)
         self.displayModeComboBox = QtGui.QComboBox(self.centralwidget)
         self.displayModeComboBox.setObjectName("displayModeComboBox")
@@ -125,11 +129,26 @@ class Ui_MainWindow(object):
         self.actionSave_to_Spreadsheet.setObjectName("actionSave_to_Spreadsheet")
         self.actionOpen = QtGui.QAction(MainWindow)
         self.actionOpen.setObjectName("actionOpen")
+        self.actionSave = QtGui.QAction(MainWindow)
+        self.actionSave.setEnabled(False)
+        self.actionSave.setObjectName("actionSave")
         self.actionDefault = QtGui.QAction(MainWindow)
         self.actionDefault.setObjectName("actionDefault")
+        self.actionRecord_Timings = QtGui.QAction(MainWindow)
+        self.actionRecord_Timings.setCheckable(True)
+        self.actionRecord_Timings.setObjectName("actionRecord_Timings")
+        self.actionSave_Timings = QtGui.QAction(MainWindow)
+        self.actionSave_Timings.setObjectName("actionSave_Timings")
+        self.actionProfile_Next_Capture = QtGui.QAction(MainWindow)
+        self.actionProfile_Next_Capture.setObjectName("actionProfile_Next_Capture")
         self.menuFile.addAction(self.actionOpen)
+        self.menuFile.addAction(self.actionSave)
         self.menuFile.addAction(self.actionSave_to_Spreadsheet)
         self.menuView.addAction(self.menuTheme.menuAction())
+        self.menuView.addSeparator()
+        self.menuView.addAction(self.actionRecord_Timings)
+        self.menuView.addAction(self.actionSave_Timings)
+        self.menuView.addAction(self.actionProfile_Next_Capture)
         self.menubar.addAction(self.menuFile.menuAction())
         self.menubar.addAction(self.menuView.menuAction())
 
@@ -147,12 +166,12 @@ class Ui_MainWindow(object):
         self.triggerChannelComboBox.setItemText(3, QtGui.QApplication.translate("MainWindow", "Channel 3", None, QtGui.QApplication.UnicodeUTF8))
         self.triggerSlopeComboBox.setItemText(0, QtGui.QApplication.translate("MainWindow", "Rising", None, QtGui.QApplication.UnicodeUTF8))
         self.triggerSlopeComboBox.setItemText(1, QtGui.QApplication.translate("MainWindow", "Falling", None, QtGui.QApplication.UnicodeUTF8))
+        self.continuousCheckBox.setText(QtGui.QApplication.translate("MainWindow", "Continuous", None, QtGui.QApplication.UnicodeUTF8))
+        self.softwareTriggerLineEdit.setToolTip(QtGui.QApplication.translate("MainWindow", "Software trigger for continuous mode: pattern 1x0x, width channel=0 min=5 max=100 level=1, or usart 0x55 baud=9600", None, QtGui.QApplication.UnicodeUTF8))
+        self.softwareTriggerLineEdit.setPlaceholderText(QtGui.QApplication.translate("MainWindow", "Software trigger", None, QtGui.QApplication.UnicodeUTF8))
         self.startButton.setText(QtGui.QApplication.translate("MainWindow", "Start", None, QtGui.QApplication.UnicodeUTF8))
         self.protocolComboBox.setToolTip(QtGui.QApplication.translate("MainWindow", "Select a suitable communication protocol.", None, QtGui.QApplication.UnicodeUTF8))
         self.protocolComboBox.setItemText(0, QtGui.QApplication.translate("MainWindow", "General I/O", None, QtGui.QApplication.UnicodeUTF8))
-        self.protocolComboBox.setItemText(1, QtGui.QApplication.translate("MainWindow", "I2C...", None, QtGui.QApplication.UnicodeUTF8))
-        self.protocolComboBox.setItemText(2, QtGui.QApplication.translate("MainWindow", "SPI...", None, QtGui.QApplication.UnicodeUTF8))
-        self.protocolComboBox.setItemText(3, QtGui.QApplication.translate("MainWindow", "USART...", None, QtGui.QApplication.UnicodeUTF8))
         self.displayModeComboBox.setItemText(0, QtGui.QApplication.translate("MainWindow", "Ascii", None, QtGui.QApplication.UnicodeUTF8))
         self.displayModeComboBox.setItemText(1, QtGui.QApplication.translate("MainWindow", "Hex", None, QtGui.QApplication.UnicodeUTF8))
         self.displayModeComboBox.setItemText(2, QtGui.QApplication.translate("MainWindow", "Decimal", None, QtGui.QApplication.UnicodeUTF8))
@@ -161,9 +180,14 @@ class Ui_MainWindow(object):
         self.menuTheme.setTitle(QtGui.QApplication.translate("MainWindow", "Theme", None, QtGui.QApplication.UnicodeUTF8))
         self.toolBar.setWindowTitle(QtGui.QApplication.translate("MainWindow", "toolBar", None, QtGui.QApplication.UnicodeUTF8))
         self.actionSave_to_Spreadsheet.setText(QtGui.QApplication.translate("MainWindow", "Save to Spreadsheet...", None, QtGui.QApplication.UnicodeUTF8))
-        self.actionSave_to_Spreadsheet.setShortcut(QtGui.QApplication.translate("MainWindow", "Ctrl+S", None, QtGui.QApplication.UnicodeUTF8))
+        self.actionSave_to_Spreadsheet.setShortcut(QtGui.QApplication.translate("MainWindow", "Ctrl+Shift+S", None, QtGui.QApplication.UnicodeUTF8))
         self.actionOpen.setText(QtGui.QApplication.translate("MainWindow", "Open...", None, QtGui.QApplication.UnicodeUTF8))
         self.actionOpen.setShortcut(QtGui.QApplication.translate("MainWindow", "Ctrl+O", None, QtGui.QApplication.UnicodeUTF8))
+        self.actionSave.setText(QtGui.QApplication.translate("MainWindow", "Save...", None, QtGui.QApplication.UnicodeUTF8))
+        self.actionSave.setShortcut(QtGui.QApplication.translate("MainWindow", "Ctrl+S", None, QtGui.QApplication.UnicodeUTF8))
         self.actionDefault.setText(QtGui.QApplication.translate("MainWindow", "Default", None, QtGui.QApplication.UnicodeUTF8))
+        self.actionRecord_Timings.setText(QtGui.QApplication.translate("MainWindow", "Record Timings", None, QtGui.QApplication.UnicodeUTF8))
+        self.actionSave_Timings.setText(QtGui.QApplication.translate("MainWindow", "Save Timings...", None, QtGui.QApplication.UnicodeUTF8))
+        self.actionProfile_Next_Capture.setText(QtGui.QApplication.translate("MainWindow", "Profile Next Capture...", None, QtGui.QApplication.UnicodeUTF8))
 
 from ui.widgets import AnalyzerWidget
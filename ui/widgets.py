@@ -1,7 +1,12 @@
+import bisect
+from array import array
+
 from PySide import QtGui, QtCore, QtOpenGL
 
 import models
 import analyzers
+import analyzers.cache
+import timing
 
 from ui.analyzer_dialog import Ui_AnalyzerDialog
 
@@ -18,12 +23,20 @@ class AnalyzerWidget(QtGui.QGraphicsView):
         self.scene = QtGui.QGraphicsScene(self)
         self.setScene(self.scene)
         self.data = models.Acquisition([[], [], [], []])
-        self.byteLabelItems = []
+        self.channelItems = []
+        self.byteLabelLayer = None
         self.byteLabels = []
         self.byteFormat = 'ascii'
         self.setResizeAnchor(QtGui.QGraphicsView.AnchorUnderMouse)
         self._subviewMargin = 24
         self._pulseWidthCoords = None
+        self._mousePos = None
+        # Mouse moves are coalesced so that at most one pulse width
+        # measurement and repaint happens per frame.
+        self._measureTimer = QtCore.QTimer(self)
+        self._measureTimer.setSingleShot(True)
+        self._measureTimer.setInterval(16)
+        self._measureTimer.timeout.connect(self.measurePulseWidth)
         self.waveformLabels = analyzers.labels('')
         self.grabGesture(QtCore.Qt.PinchGesture)
         self.setViewport(QtOpenGL.QGLWidget(
@@ -40,13 +53,12 @@ class AnalyzerWidget(QtGui.QGraphicsView):
         """
         self.data = data
         self.byteLabels = []
-        self.byteLabelItems = []
         if redraw:
             self.redraw()
 
     def setByteFormat(self, format_type):
         """
-        Sets the byte display format.
+        Sets the byte display format, only the label text is updated.
 
         Parameters
         ----------
@@ -54,7 +66,7 @@ class AnalyzerWidget(QtGui.QGraphicsView):
             The display format, one of 'ascii', 'hex', 'decimal'.
         """
         self.byteFormat = format_type
-        self.redraw()
+        self.byteLabelLayer.setByteFormat(self.byteFormat)
 
     def setByteLabels(self, labels, redraw=False):
         """
@@ -66,14 +78,13 @@ class AnalyzerWidget(QtGui.QGraphicsView):
             There should be 4 lists, with each list containing a list of tuples
             for a single waveform. The tuple format is (x, width, text). Where
             x is the left most edge of the label.
+        redraw : bool
+            If True the label items are rebuilt, the waveforms are left
+            untouched.
         """
         self.byteLabels = labels
         if redraw:
-            self.redraw()
-
-    def setByteLabelItemsVisible(self, visible=True):
-        for label in self.byteLabelItems:
-            label.setVisible(visible)
+            self.drawByteLabels()
 
     def setWaveformLabels(self, labels):
         self.waveformLabels = labels
@@ -95,41 +106,61 @@ class AnalyzerWidget(QtGui.QGraphicsView):
             self.channelPens.append(p)
         self.scene.setBackgroundBrush(QtGui.QBrush(
             QtGui.QColor(*self.theme.get('background', [0, 0, 0, 255]))))
-        self.redraw()
+        # Only pens and brushes depend on the theme, update them in place.
+        for item, pen in zip(self.channelItems, self.channelPens):
+            item.setPen(pen)
+        if self.byteLabelLayer is not None:
+            self.byteLabelLayer.setTheme(self.theme)
+
+    def subviewHeight(self):
+        return self.height() / len(self.data) - self._subviewMargin / 2
 
     def drawSignals(self):
+        self.channelItems = []
         if self.data.acquisition_length == 0:
             return
-        subviewHeight = (self.height() / len(self.data) -
-                         self._subviewMargin / 2)
         for i, data in enumerate(self.data):
-            item = AnalyzerChannelGraphicsItem(data, subviewHeight,
+            item = AnalyzerChannelGraphicsItem(data, self.subviewHeight(),
                                                self.channelPens[i])
-            item.setY(i*subviewHeight + i*self._subviewMargin / 2)
+            self.channelItems.append(item)
             self.scene.addItem(item)
 
     def drawByteLabels(self):
-        self.byteLabelItems = []
-        subviewHeight = (self.height() / len(self.data) -
-                         self._subviewMargin / 2)
-        for y, waveform_labels in enumerate(self.byteLabels):
-            for x, width, value in waveform_labels:
-                text = analyzers.format_byte(value, self.byteFormat)
-                new_item = ByteLabelGraphicsItem(
-                    x, y*subviewHeight + 2, width, self._subviewMargin - 4,
-                    text, self.theme)
-                self.byteLabelItems.append(new_item)
-                self.scene.addItem(new_item)
+        if self.byteLabelLayer is None:
+            self.byteLabelLayer = ByteLabelLayerGraphicsItem(
+                self._subviewMargin - 4, self.theme)
+            self.byteLabelLayer.setZValue(1)
+            self.scene.addItem(self.byteLabelLayer)
+        self.byteLabelLayer.setLabels(self.byteLabels, self.byteFormat)
+        self.layoutItems()
+
+    def layoutItems(self):
+        """
+        Positions the existing items for the current widget height without
+        rebuilding any of them.
+        """
+        subviewHeight = self.subviewHeight()
+        for i, item in enumerate(self.channelItems):
+            item.setHeight(subviewHeight)
+            item.setY(i*subviewHeight + i*self._subviewMargin / 2)
+        if self.byteLabelLayer is not None:
+            self.byteLabelLayer.setRowHeight(subviewHeight)
+        self.scene.setSceneRect(0, 0, self.data.acquisition_length,
+                                self.height() - self._subviewMargin/2)
 
+    @timing.timed('redraw')
     def redraw(self):
+        """
+        Rebuilds every item in the scene, this is only needed when the data
+        changes.
+        """
         x_scale = self.transform().m11()
         self.resetTransform()
-        self.scene.clear()
+        for item in self.channelItems:
+            self.scene.removeItem(item)
         self.drawSignals()
         self.drawByteLabels()
         self.setScale(x_scale, 1)
-        self.scene.setSceneRect(0, 0, self.data.acquisition_length,
-                                self.height() - self._subviewMargin/2)
 
     def event(self, event):
         if event.type() == QtCore.QEvent.Gesture:
@@ -185,7 +216,8 @@ class AnalyzerWidget(QtGui.QGraphicsView):
 
     def resizeEvent(self, event):
         super(AnalyzerWidget, self).resizeEvent(event)
-        self.redraw()
+        self.layoutItems()
+        self.setScale(self.transform().m11(), 1)
 
     def gestureEvent(self, event):
         """
@@ -230,33 +262,25 @@ class AnalyzerWidget(QtGui.QGraphicsView):
             x_scale = min_scale
         self.resetTransform()
         super(AnalyzerWidget, self).scale(x_scale, y_scale)
-        try:
-            if (self.byteLabelItems[0].boundingRect().width() *
-                    self.transform().m11()) < 30:
-                self.setByteLabelItemsVisible(False)
-            else:
-                self.setByteLabelItemsVisible(True)
-        except:
-            pass
 
     def mouseMoveEvent(self, event):
-        if self.data.acquisition_length < 1:
+        self._mousePos = event.pos()
+        if not self._measureTimer.isActive():
+            self._measureTimer.start()
+
+    def measurePulseWidth(self):
+        """
+        Measures the pulse under the last known mouse position and displays
+        its width.
+        """
+        if self.data.acquisition_length < 1 or self._mousePos is None:
             return
-        pt = self.mapToScene(event.pos())
+        pt = self.mapToScene(self._mousePos)
         # Find transition points on either side of mouse pos.
         waveform_pos = int(pt.y() // (self.height() / self.data.channel_count))
-        index = int(pt.x())
-        start_index = index
-        finish_index = index
-        while (start_index > 0 and
-                self.data[waveform_pos][start_index] ==
-                self.data[waveform_pos][index]):
-                start_index -= 1
-        start_index += 1
-        while (finish_index < self.data.acquisition_length and
-                self.data[waveform_pos][finish_index] ==
-                self.data[waveform_pos][index]):
-                finish_index += 1
+        waveform_pos = min(max(waveform_pos, 0), self.data.channel_count - 1)
+        index = min(max(int(pt.x()), 0), self.data.acquisition_length - 1)
+        start_index, finish_index, _ = self.data[waveform_pos].run_at(index)
 
         self._pulseWidthCoords = {
             'waveform_pos': waveform_pos,
@@ -277,44 +301,104 @@ class AnalyzerWidget(QtGui.QGraphicsView):
         self.update()
 
 
-class AnalyzerChannelGraphicsItem(QtGui.QGraphicsItemGroup):
+class AnalyzerChannelGraphicsItem(QtGui.QGraphicsItem):
     """
     The view of a single channel, including the waveform and labels.
 
+    Only the exposed part of the waveform is painted, with at most about one
+    segment per pixel column. Where a single column holds several toggles an
+    activity band is drawn instead of the individual edges.
+
     Parameters
     ----------
-    data : array
-        A 1d array of 1's or 0's.
+    data : Channel
+        The channel to draw, a 1d array of 1's or 0's with an edge index.
     height : int
         The height that the waveform should be drawn, including room
         for the top margin for label display.
     pen : QPen
         A QPen object to draw the waveform with.
     """
+    topMargin = 32
+
     def __init__(self, data, height, pen, parent=None):
         super(AnalyzerChannelGraphicsItem, self).__init__(parent)
+        self.setFlag(QtGui.QGraphicsItem.ItemUsesExtendedStyleOption)
         self.data = data
         self.pen = pen
         self.height = height
-        topMargin = 32
-        waveformHeight = height - topMargin
-
-        # Build path with as few lines as possible.
-        path = QtGui.QPainterPath(QtCore.QPointF(0, -data[0]*waveformHeight))
-        x = 0
-        y = self.data[0]
-        while x < len(self.data):
-            while x < len(self.data) and self.data[x] == y:
-                x += 1
-            path.lineTo(x, -y*waveformHeight)
-            y = 0 if y == 1 else 1
-            if x != len(self.data):
-                path.lineTo(x, -y*waveformHeight)
-        path.translate(0, waveformHeight + topMargin)
-
-        self.waveformPathItem = QtGui.QGraphicsPathItem(path, self)
-        self.waveformPathItem.setPen(pen)
-        self.addToGroup(self.waveformPathItem)
+
+    def boundingRect(self):
+        return QtCore.QRectF(0, 0, len(self.data), self.height)
+
+    def setPen(self, pen):
+        self.pen = pen
+        self.update()
+
+    def setHeight(self, height):
+        if height != self.height:
+            self.prepareGeometryChange()
+            self.height = height
+
+    def _y(self, value):
+        """
+        Returns the item y coordinate of the given logic level.
+        """
+        return self.topMargin + (1 - value) * (self.height - self.topMargin)
+
+    @timing.timed('paint waveform')
+    def paint(self, painter, option, widget):
+        length = len(self.data)
+        if length == 0:
+            return
+        rect = option.exposedRect
+        start = min(max(int(rect.left()), 0), length - 1)
+        stop = min(max(int(rect.right()) + 2, start + 1), length)
+        # Number of samples covered by a single pixel column.
+        step = 1.0 / max(painter.worldTransform().m11(), 1e-12)
+        edges = self.data.edges()
+
+        path = QtGui.QPainterPath()
+        bands = []
+        value = self.data[start]
+        path.moveTo(start, self._y(value))
+        n = bisect.bisect_right(edges, start)
+        while n < len(edges) and edges[n] < stop:
+            edge = edges[n]
+            path.lineTo(edge, self._y(value))
+            if n + 1 < len(edges) and edges[n + 1] - edge < step:
+                # Several toggles share a column, extend the band one column
+                # at a time until a column without edges is found or the
+                # exposed span ends.
+                end = edge
+                while end < stop:
+                    k = bisect.bisect_left(edges, end + step, n)
+                    if edges[k - 1] == end:
+                        break
+                    end = edges[k - 1]
+                n = k
+                value = self.data[end]
+                end = min(end, stop)
+                bands.append(QtCore.QRectF(edge, self._y(1),
+                                           min(max(end - edge, step),
+                                               stop - edge),
+                                           self._y(0) - self._y(1)))
+                path.moveTo(end, self._y(value))
+            else:
+                value = 1 - value
+                path.lineTo(edge, self._y(value))
+                n += 1
+        path.lineTo(stop, self._y(value))
+
+        painter.setPen(self.pen)
+        painter.setBrush(QtCore.Qt.NoBrush)
+        painter.drawPath(path)
+        if bands:
+            color = QtGui.QColor(self.pen.color())
+            color.setAlpha(color.alpha() // 2)
+            painter.setBrush(QtGui.QBrush(color))
+            for band in bands:
+                painter.drawRect(band)
 
 
 class HorizontalArrowGraphicsItem(QtGui.QGraphicsItem):
@@ -347,55 +431,182 @@ class HorizontalArrowGraphicsItem(QtGui.QGraphicsItem):
                          self._coords[1] + self._height / 2)
 
 
-class ByteLabelGraphicsItem(QtGui.QGraphicsItem):
+class ByteLabelLayerGraphicsItem(QtGui.QGraphicsItem):
     """
-    Draws a byte label centered at the given point.
+    Draws the byte labels of every waveform as a single item.
+
+    The labels of each waveform are kept sorted by position so that only the
+    labels intersecting the exposed rect are painted. Pens, brushes and text
+    widths are cached, and labels narrower than minimumWidth pixels at the
+    current zoom are not drawn.
+
+    Parameters
+    ----------
+    labelHeight : int
+        The height of a label in pixels.
+    theme : dict
+        The theme to draw the labels with.
     """
-    def __init__(self, x, y, width, height, text, theme):
-        super(ByteLabelGraphicsItem, self).__init__()
-        self.x = x
-        self.y = y
-        self.width = width
-        self.height = height
-        self.theme = theme
-        self.text = text
+    minimumWidth = 30
+
+    def __init__(self, labelHeight, theme, parent=None):
+        super(ByteLabelLayerGraphicsItem, self).__init__(parent)
+        self.setFlag(QtGui.QGraphicsItem.ItemUsesExtendedStyleOption)
+        self.labelHeight = labelHeight
+        self.rowHeight = 0
+        self.rows = []
+        self.formatType = 'ascii'
+        self._length = 0
+        self._maxWidth = 0
+        self._textWidths = {}
+        self.setTheme(theme)
+
+    def setLabels(self, labels, format_type):
+        """
+        Parameters
+        ----------
+        labels : List of List of tuple or List of LabelArrays
+            One list of (x, width, value) tuples per waveform.
+        format_type : str
+            The display format, one of 'ascii', 'hex', 'decimal'.
+        """
+        self.prepareGeometryChange()
+        self.rows = []
+        self._maxWidth = 0
+        self._length = 0
+        for waveform_labels in labels:
+            if not isinstance(waveform_labels, analyzers.cache.LabelArrays):
+                waveform_labels = analyzers.cache.LabelArrays(waveform_labels)
+            row = {'x': waveform_labels.x,
+                   'width': waveform_labels.width,
+                   'values': waveform_labels.values,
+                   'texts': {}}
+            # Running maximum of the right edges, used to find the first
+            # label that may intersect a given x.
+            ends = array('d')
+            end = 0
+            for x, width in zip(row['x'], row['width']):
+                end = max(end, x + width)
+                ends.append(end)
+            row['end'] = ends
+            if len(waveform_labels):
+                self._maxWidth = max(self._maxWidth, max(row['width']))
+                self._length = max(self._length, end)
+            self.rows.append(row)
+        self.setByteFormat(format_type)
+
+    def setByteFormat(self, format_type):
+        self.formatType = format_type
+        for row in self.rows:
+            # Formatted text is kept per format so switching back is free.
+            if format_type not in row['texts']:
+                row['texts'][format_type] = [
+                    analyzers.format_byte(v, format_type)
+                    for v in row['values']]
+            row['text'] = row['texts'][format_type]
+        self.update()
+
+    def setTheme(self, theme):
+        labels = theme.get('labels', {})
+        self._borderPen = QtGui.QPen(QtGui.QColor(
+            *labels.get('border', [255, 255, 255, 255])))
+        self._backgroundBrush = QtGui.QBrush(QtGui.QColor(
+            *labels.get('background', [0, 0, 0, 255])))
+        self._textPen = QtGui.QPen(QtGui.QColor(
+            *labels.get('text', [255, 255, 255, 255])))
+        self.update()
+
+    def setRowHeight(self, rowHeight):
+        if rowHeight != self.rowHeight:
+            self.prepareGeometryChange()
+            self.rowHeight = rowHeight
 
     def boundingRect(self):
-        return QtCore.QRectF(self.x, self.y, self.width, self.height)
+        return QtCore.QRectF(0, 0, self._length,
+                             len(self.rows) * self.rowHeight)
+
+    def _textWidth(self, painter, text):
+        try:
+            return self._textWidths[text]
+        except KeyError:
+            width = painter.fontMetrics().width(text)
+            self._textWidths[text] = width
+            return width
 
+    @timing.timed('paint labels')
     def paint(self, painter, option, widget):
-        painter.setPen(
-            QtGui.QPen(QtGui.QColor(
-                *self.theme['labels'].get('border', [255, 255, 255, 255]))))
-        painter.setBrush(
-            QtGui.QBrush(QtGui.QColor(
-                *self.theme['labels'].get('background', [0, 0, 0, 255]))))
         transform = painter.transform()
-        x = self.x * transform.m11()
-        y = self.y * transform.m22()
-        width = self.width * transform.m11()
-        height = self.height * transform.m22()
+        x_scale = transform.m11()
+        if self._maxWidth * x_scale < self.minimumWidth:
+            return
+        rect = option.exposedRect
+        height = self.labelHeight * transform.m22()
         painter.resetTransform()
         painter.translate(transform.m31(), transform.m32())
-        painter.drawRoundedRect(x, y, width, height, height / 2, height / 2)
-        painter.setPen(
-            QtGui.QPen(QtGui.QColor(
-                *self.theme['labels'].get('text', [255, 255, 255, 255]))))
-        painter.drawText(x, y, width, height,
-                         QtCore.Qt.AlignCenter | QtCore.Qt.AlignHCenter,
-                         self.text)
+        for n, row in enumerate(self.rows):
+            y = (n * self.rowHeight + 2) * transform.m22()
+            first = bisect.bisect_left(row['end'], rect.left())
+            last = bisect.bisect_right(row['x'], rect.right())
+            for i in range(first, last):
+                width = row['width'][i] * x_scale
+                if width < self.minimumWidth:
+                    continue
+                x = row['x'][i] * x_scale
+                painter.setPen(self._borderPen)
+                painter.setBrush(self._backgroundBrush)
+                painter.drawRoundedRect(x, y, width, height,
+                                        height / 2, height / 2)
+                text = row['text'][i]
+                if self._textWidth(painter, text) < width:
+                    painter.setPen(self._textPen)
+                    painter.drawText(x, y, width, height,
+                                     QtCore.Qt.AlignCenter |
+                                     QtCore.Qt.AlignHCenter,
+                                     text)
 
 
 class AnalyzerDialog(QtGui.QDialog, Ui_AnalyzerDialog):
     """
-    Dialog box to display options for analyzers.
+    Dialog box to display options for analyzers. A page of options is built
+    for each registered analyzer.
     """
     def __init__(self, parent=None):
         super(AnalyzerDialog, self).__init__(parent)
         self.setupUi(self)
+        self.optionComboBoxes = []
+        for name in analyzers.names():
+            page = QtGui.QWidget()
+            layout = QtGui.QFormLayout(page)
+            layout.setFieldGrowthPolicy(
+                QtGui.QFormLayout.FieldsStayAtSizeHint)
+            comboBoxes = {}
+            for option in analyzers.info(name).options:
+                comboBox = QtGui.QComboBox(page)
+                comboBox.setEditable(option.editable)
+                for text, _ in option.choices:
+                    comboBox.addItem(text)
+                comboBox.setCurrentIndex(option.default)
+                layout.addRow(option.label, comboBox)
+                comboBoxes[option.name] = comboBox
+            self.optionComboBoxes.append(comboBoxes)
+            self.stackedWidget.addWidget(page)
+            self.protocolComboBox.addItem(name)
         self.stackedWidget.setCurrentIndex(
             self.protocolComboBox.currentIndex())
 
+    def analyzerName(self):
+        return self.protocolComboBox.currentText()
+
+    def options(self):
+        """
+        Returns the options selected for the current analyzer as a dict.
+        Raises ValueError if an entered value is invalid.
+        """
+        comboBoxes = self.optionComboBoxes[
+            self.protocolComboBox.currentIndex()]
+        return dict((o.name, o.value(comboBoxes[o.name].currentText()))
+                    for o in analyzers.info(self.analyzerName()).options)
+
     @QtCore.Slot()
     def on_protocolComboBox_currentIndexChanged(self):
         self.stackedWidget.setCurrentIndex(